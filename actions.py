@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import Optional, Tuple, TYPE_CHECKING
 import color
+from entity import Item
 import exceptions
 
 if TYPE_CHECKING:
     from engine import Engine
-    from entity import Actor, Entity, Item
+    from entity import Actor, Entity
 
 class Action:
     def __init__(self, entity: Actor) -> None:
@@ -37,12 +38,14 @@ class PickupAction(Action):
         actor_location_y = self.entity.y
         inventory = self.entity.inventory
         
-        for item in self.engine.game_map.items:
-            if actor_location_x == item.x and actor_location_y == item.y:
+        for item in self.engine.game_map.get_entities_at_location(
+            actor_location_x, actor_location_y
+        ):
+            if isinstance(item, Item):
                 if len(inventory.items) >= inventory.capacity:
                     raise exceptions.Impossible("Your inventory is full")
                 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.parent = self.entity.inventory
                 inventory.items.append(item)
                 
@@ -94,13 +97,21 @@ class WaitAction(Action):
 class TakeStairsAction(Action):
     def perform(self) -> None:
         #Take the stairs, if any exist at the entity location
-        if (self.entity.x, self.entity.y) == self.engine.game_map.downstairs_location:
+        location = (self.entity.x, self.entity.y)
+        if location == self.engine.game_map.downstairs_location:
             self.engine.game_world.generate_floor()
             self.engine.message_log.add_message(
                 "You descend to the next floor", color.descend
             )
+        elif location == self.engine.game_map.upstairs_location:
+            self.engine.game_world.ascend()
+            self.engine.message_log.add_message(
+                "You climb back up to the previous floor", color.ascend
+            )
         else:
             raise exceptions.Impossible("There are no stairs here")
+        if self.engine.autosaver:
+            self.engine.autosaver.request()
 
 class ActionWithDirection(Action):
     def __init__(self, entity: Actor, dx: int, dy: int):
@@ -0,0 +1,99 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+
+class ActorStore:
+    """Numpy columns mirroring the actors on a GameMap, for vectorized queries.
+    Each actor owns a slot, its id, in every column. Slots of removed actors are
+    reused, and `alive` is False for empty slots as well as for corpses.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.hp = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.actors: List[Optional[Actor]] = [None] * capacity #Slot id -> Actor
+        self.ids: Dict[Actor, int] = {} #Actor -> slot id
+        self.free_ids: List[int] = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def grow(self) -> None:
+        old_capacity = len(self.actors)
+        capacity = old_capacity * 2
+        for name in ("x", "y", "hp", "alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:old_capacity] = column
+            setattr(self, name, grown)
+        self.actors.extend([None] * old_capacity)
+        self.free_ids.extend(range(capacity - 1, old_capacity - 1, -1))
+
+    def add(self, actor: Actor) -> None:
+        if not self.free_ids:
+            self.grow()
+        actor_id = self.free_ids.pop()
+        self.ids[actor] = actor_id
+        self.actors[actor_id] = actor
+        self.x[actor_id] = actor.x
+        self.y[actor_id] = actor.y
+        self.hp[actor_id] = actor.fighter.hp
+        self.alive[actor_id] = actor.is_alive
+
+    def remove(self, actor: Actor) -> None:
+        actor_id = self.ids.pop(actor)
+        self.actors[actor_id] = None
+        self.alive[actor_id] = False
+        self.free_ids.append(actor_id)
+
+    def move(self, actor: Actor, x: int, y: int) -> None:
+        actor_id = self.ids[actor]
+        self.x[actor_id] = x
+        self.y[actor_id] = y
+
+    def update(self, actor: Actor) -> None:
+        """Copy the hit points and living state of an actor into the columns."""
+        actor_id = self.ids.get(actor)
+        if actor_id is not None:
+            self.hp[actor_id] = actor.fighter.hp
+            self.alive[actor_id] = actor.is_alive
+
+    def get_actors(self, actor_ids: np.ndarray) -> List[Actor]:
+        return [self.actors[actor_id] for actor_id in actor_ids.tolist()]
+
+    def squared_distances(self, x: int, y: int) -> np.ndarray:
+        return (self.x - x) ** 2 + (self.y - y) ** 2
+
+    def get_actors_within_radius(self, x: int, y: int, radius: float) -> List[Actor]:
+        """Return the living actors whose distance to (x, y) is at most `radius`."""
+        in_range = self.alive & (self.squared_distances(x, y) <= radius ** 2)
+        return self.get_actors(np.flatnonzero(in_range))
+
+    def get_nearest_actor(
+        self,
+        x: int,
+        y: int,
+        maximum_distance: float,
+        visible: Optional[np.ndarray] = None,
+        exclude: Optional[Actor] = None,
+    ) -> Optional[Actor]:
+        """Return the closest living actor nearer than `maximum_distance` to (x, y).
+        Only actors standing on True tiles of `visible` are considered, if it's given.
+        """
+        candidates = self.alive.copy()
+        if visible is not None:
+            candidates &= visible[self.x, self.y]
+        if exclude is not None and exclude in self.ids:
+            candidates[self.ids[exclude]] = False
+
+        distances = np.where(candidates, self.squared_distances(x, y), np.iinfo(np.int32).max)
+        nearest_id = int(np.argmin(distances))
+        if not candidates[nearest_id] or distances[nearest_id] >= maximum_distance ** 2:
+            return None
+        return self.actors[nearest_id]
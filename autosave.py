@@ -0,0 +1,84 @@
+#Periodic saves which are compressed and written on a worker thread
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+import traceback
+from typing import Deque, Dict, Optional, TYPE_CHECKING
+import savefile
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+
+class Autosaver:
+    """Save the game every `interval` turns and whenever a save is requested.
+    The engine is encoded on the main thread, which is cheap, and the compression
+    and disk writes happen on a worker so the game loop never waits on them.
+    """
+
+    def __init__(self, filename: str, interval: int = 25, codec: str = savefile.DEFAULT_CODEC):
+        self.filename = filename
+        self.interval = interval
+        self.codec = codec
+        self.turns_since_save = 0
+        self.save_requested = False
+
+        self.last_save_time: Optional[float] = None #time.time() of the last successful save
+        self.last_error: Optional[BaseException] = None
+        self.durations: Deque[float] = deque(maxlen=100) #Seconds taken by each autosave
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self.pending: Optional[Future] = None
+        self.lock = threading.Lock()
+
+    @property
+    def last_duration(self) -> Optional[float]:
+        with self.lock:
+            return self.durations[-1] if self.durations else None
+
+    def request(self) -> None:
+        """Save at the end of the current turn."""
+        self.save_requested = True
+
+    def end_turn(self, engine: Engine) -> None:
+        """Count a finished turn and start an autosave if one is due."""
+        self.turns_since_save += 1
+        if not engine.player.is_alive:
+            return #Finished games are not worth saving.
+        if self.save_requested or self.turns_since_save >= self.interval:
+            self.save(engine)
+
+    def save(self, engine: Engine) -> None:
+        """Snapshot the engine now and write it out in the background."""
+        if self.pending is not None and not self.pending.done():
+            return #Still writing the last one, try again next turn.
+        self.save_requested = False
+        self.turns_since_save = 0
+
+        started = time.perf_counter()
+        sections = savefile.encode_sections(engine)
+        self.pending = self.executor.submit(self.write, sections, started)
+
+    def write(self, sections: Dict[str, bytes], started: float) -> None:
+        try:
+            savefile.write_sections(self.filename, sections, self.codec)
+        except Exception as exc:
+            traceback.print_exc() #Print error to stderr
+            with self.lock:
+                self.last_error = exc
+            return
+        with self.lock:
+            self.last_save_time = time.time()
+            self.last_error = None
+            self.durations.append(time.perf_counter() - started)
+
+    def wait(self) -> None:
+        """Block until the autosave in progress, if any, is on disk."""
+        if self.pending is not None:
+            self.pending.result()
+
+    def close(self) -> None:
+        self.wait()
+        self.executor.shutdown()
@@ -0,0 +1,75 @@
+"""Command line for the benchmark suite.
+
+    python -m benchmarks list
+    python -m benchmarks run [--quick] [--output results.json] [--baseline baseline.json]
+    python -m benchmarks compare baseline.json results.json
+
+`run` exits with status 1 when a baseline is given and a benchmark is slower than
+it by more than `--threshold`, as does `compare`.
+"""
+from __future__ import annotations
+import argparse
+import fnmatch
+import sys
+from typing import List, Optional
+
+from benchmarks import harness
+import benchmarks.scenarios  # noqa: F401 (registers the scenarios)
+
+
+def select(patterns: List[str]) -> List[str]:
+    if not patterns:
+        return list(harness.REGISTRY)
+    return [
+        name for name in harness.REGISTRY
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the registered benchmarks.")
+
+    run_parser = commands.add_parser("run", help="Run benchmarks and record the results.")
+    run_parser.add_argument("patterns", nargs="*", help="Glob patterns of benchmarks to run.")
+    run_parser.add_argument("--output", help="Write the results to this JSON file.")
+    run_parser.add_argument("--baseline", help="Compare the results to this JSON file.")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--quick", action="store_true", help="Only run the smallest size of each sweep.")
+    run_parser.add_argument("--threshold", type=float, default=0.15,
+                            help="Allowed slowdown against the baseline (default 0.15).")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, bench in harness.REGISTRY.items():
+            params = ", ".join(harness.format_param(param) for param in bench.params)
+            print(f"{name:<32} {params}")
+        return 0
+
+    if args.command == "run":
+        results = harness.run(select(args.patterns), seed=args.seed, quick=args.quick)
+        if args.output:
+            harness.save(args.output, results, args.seed)
+        if args.baseline:
+            print()
+            if harness.compare(harness.load(args.baseline), results, args.threshold):
+                return 1
+        return 0
+
+    regressions = harness.compare(
+        harness.load(args.baseline), harness.load(args.current), args.threshold
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
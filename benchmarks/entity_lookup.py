@@ -0,0 +1,64 @@
+"""Per-move cost of entity lookups as the number of entities on a floor grows.
+
+Run from the project root with `python -m benchmarks.entity_lookup`.
+"""
+from __future__ import annotations
+import random
+import time
+from typing import List
+
+from actions import MovementAction
+import entity_factories
+from engine import Engine
+from entity import Actor
+import exceptions
+from game_map import GameMap
+import tile_types
+
+ENTITY_COUNTS = (10, 100, 1_000, 10_000)
+MOVES = 20_000
+
+
+def build_floor(number_of_entities: int, seed: int = 0) -> GameMap:
+    """Return an open floor with `number_of_entities` goblins on distinct tiles."""
+    rng = random.Random(seed)
+    side = max(32, int((number_of_entities * 4) ** 0.5))
+    engine = Engine(player=entity_factories.player.clone())
+    game_map = GameMap(engine, side, side)
+    game_map.tiles[...] = tile_types.floor
+    engine.game_map = game_map
+    
+    engine.player.place(0, 0, game_map)
+    locations = rng.sample(range(1, side * side), number_of_entities)
+    for location in locations:
+        entity_factories.goblin.spawn(game_map, location % side, location // side)
+    return game_map
+
+
+def time_moves(game_map: GameMap, moves: int = MOVES, seed: int = 0) -> float:
+    """Return the mean seconds per attempted move of a random actor."""
+    rng = random.Random(seed)
+    actors: List[Actor] = [
+        actor for actor in game_map.actors if actor is not game_map.engine.player
+    ]
+    directions = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+    plan = [(rng.choice(actors), *rng.choice(directions)) for _ in range(moves)]
+    
+    start = time.perf_counter()
+    for actor, dx, dy in plan:
+        try:
+            MovementAction(actor, dx, dy).perform()
+        except exceptions.Impossible:
+            pass #Blocked moves still pay for the lookup.
+    return (time.perf_counter() - start) / moves
+
+
+def main() -> None:
+    print(f"{'entities':>10} {'us/move':>10}")
+    for count in ENTITY_COUNTS:
+        per_move = time_moves(build_floor(count))
+        print(f"{count:>10} {per_move * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Registration, timing and comparison of benchmark scenarios."""
+from __future__ import annotations
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+Scenario = Callable[..., Callable[[], None]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    scenario: Scenario
+    params: Sequence[Any]
+    repeat: int
+    number: int
+    fresh: bool
+
+
+REGISTRY: Dict[str, Benchmark] = {}
+
+
+def benchmark(
+    name: str,
+    params: Sequence[Any] = (None,),
+    *,
+    repeat: int = 5,
+    number: int = 1,
+    fresh: bool = False,
+) -> Callable[[Scenario], Scenario]:
+    """Register a scenario under `name`.
+    The scenario is called with one of `params` and returns the function to time,
+    so its setup is never measured. `number` calls are timed per repeat. When `fresh`
+    is True the scenario is set up again before every repeat, for work that changes
+    the state it runs on.
+    """
+    def decorator(scenario: Scenario) -> Scenario:
+        REGISTRY[name] = Benchmark(name, scenario, params, repeat, number, fresh)
+        return scenario
+    return decorator
+
+
+def format_param(param: Any) -> str:
+    if param is None:
+        return ""
+    if isinstance(param, tuple):
+        return "[" + "x".join(str(value) for value in param) + "]"
+    return f"[{param}]"
+
+
+def measure(bench: Benchmark, param: Any, seed: int) -> Dict[str, float]:
+    """Time one parameter of a benchmark and return per-call statistics in seconds."""
+    timings: List[float] = []
+    function: Optional[Callable[[], None]] = None
+    for _ in range(bench.repeat):
+        if function is None or bench.fresh:
+            random.seed(seed)
+            function = bench.scenario(param)
+        start = time.perf_counter()
+        for _ in range(bench.number):
+            function()
+        timings.append((time.perf_counter() - start) / bench.number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "repeat": bench.repeat,
+        "number": bench.number,
+    }
+
+
+def run(
+    names: Iterable[str], *, seed: int = 0, quick: bool = False, verbose: bool = True
+) -> Dict[str, Dict[str, float]]:
+    """Run the named benchmarks and return their statistics keyed by `name[param]`."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name in names:
+        bench = REGISTRY[name]
+        params = bench.params[:1] if quick else bench.params
+        for param in params:
+            key = name + format_param(param)
+            results[key] = measure(bench, param, seed)
+            if verbose:
+                print(f"{key:<48} {results[key]['median'] * 1e3:>12.3f} ms", flush=True)
+    return results
+
+
+def metadata(seed: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": commit,
+        "seed": seed,
+    }
+
+
+def save(filename: str, results: Dict[str, Dict[str, float]], seed: int) -> None:
+    with open(filename, "w") as f:
+        json.dump({"meta": metadata(seed), "results": results}, f, indent=2, sort_keys=True)
+
+
+def load(filename: str) -> Dict[str, Dict[str, float]]:
+    with open(filename) as f:
+        return json.load(f)["results"]
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    """Print a comparison table and return the keys that regressed by more than `threshold`."""
+    regressions: List[str] = []
+    print(f"{'benchmark':<48} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for key in sorted(current):
+        if key not in baseline:
+            print(f"{key:<48} {'-':>12} {current[key]['median'] * 1e3:>12.3f}")
+            continue
+        before = baseline[key]["median"]
+        after = current[key]["median"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<48} {before * 1e3:>12.3f} {after * 1e3:>12.3f} {ratio:>7.2f}{flag}")
+    return regressions
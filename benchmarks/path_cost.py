@@ -0,0 +1,94 @@
+"""`BaseAI.get_path_to` with the shared cost grid against rebuilding it every call.
+
+Run from the project root with `python -m benchmarks.path_cost`.
+"""
+from __future__ import annotations
+import random
+import time
+from typing import List, Tuple
+
+import numpy as np
+import tcod
+
+import entity_factories
+from engine import Engine
+from entity import Actor
+from game_map import GameMap
+import tile_types
+
+MAP_SIZES = ((80, 45), (1000, 1000))
+
+
+def build_floor(width: int, height: int, seed: int = 0) -> Tuple[GameMap, Actor]:
+    """Return a walled floor with scattered pillars and goblins, and the goblin to path from."""
+    rng = random.Random(seed)
+    engine = Engine(player=entity_factories.player.clone())
+    game_map = GameMap(engine, width, height)
+    engine.game_map = game_map
+    game_map.tiles[1:-1, 1:-1] = tile_types.floor
+    for _ in range(width * height // 20):
+        game_map.tiles[rng.randrange(1, width - 1), rng.randrange(1, height - 1)] = tile_types.wall
+    
+    engine.player.place(width - 2, height - 2, game_map)
+    game_map.tiles[width - 2, height - 2] = tile_types.floor
+    for _ in range(width * height // 100):
+        x, y = rng.randrange(1, width - 1), rng.randrange(1, height - 1)
+        if game_map.tiles["walkable"][x, y] and not game_map.get_entities_at_location(x, y):
+            entity_factories.goblin.spawn(game_map, x, y)
+    game_map.tiles[1, 1] = tile_types.floor
+    hunter = entity_factories.goblin.spawn(game_map, 1, 1)
+    return game_map, hunter
+
+
+def legacy_path_cost(game_map: GameMap) -> np.ndarray:
+    """The pre-cost-grid implementation, copying and re-stamping the grid every call."""
+    cost = np.array(game_map.tiles["walkable"], dtype=np.int8)
+    for other in game_map.entities:
+        if other.blocks_movement and cost[other.x, other.y]:
+            cost[other.x, other.y] += 10
+    return cost
+
+
+def legacy_get_path_to(entity: Actor, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
+    """`get_path_to` as it was before the cost grid was kept on the map."""
+    cost = legacy_path_cost(entity.gamemap)
+    graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
+    pathfinder = tcod.path.Pathfinder(graph)
+    pathfinder.add_root((entity.x, entity.y))
+    path: List[List[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+    return [(index[0], index[1]) for index in path]
+
+
+def time_calls(function, repeat: int) -> float:
+    """Return the best seconds per call over `repeat` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(
+        f"{'map':>10} {'grid before':>12} {'grid after':>12}"
+        f" {'path before':>12} {'path after':>12}   (ms)"
+    )
+    for width, height in MAP_SIZES:
+        game_map, hunter = build_floor(width, height)
+        player = game_map.engine.player
+        repeat = 200 if width * height < 10_000 else 5
+        
+        grid_before = time_calls(lambda: legacy_path_cost(game_map), repeat)
+        path_before = time_calls(lambda: legacy_get_path_to(hunter, player.x, player.y), repeat)
+        game_map.get_path_cost() #Build the grid once for the floor.
+        grid_after = time_calls(game_map.get_path_cost, repeat)
+        path_after = time_calls(lambda: hunter.ai.get_path_to(player.x, player.y), repeat)
+        print(
+            f"{f'{width}x{height}':>10} {grid_before * 1e3:>12.3f} {grid_after * 1e3:>12.3f}"
+            f" {path_before * 1e3:>12.3f} {path_after * 1e3:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Room placement with the occupancy grid against the old pairwise intersection tests.
+
+Run from the project root with `python -m benchmarks.room_placement`.
+"""
+from __future__ import annotations
+import random
+import time
+from typing import Callable, List, Tuple
+
+from procgen import OccupancyGrid, RectangularRoom
+
+#(map width, map height, max rooms)
+ROOM_COUNTS = ((80, 45, 30), (400, 400, 1_000), (1_000, 1_000, 10_000))
+ROOM_MIN_SIZE = 6
+ROOM_MAX_SIZE = 10
+
+
+def random_room(rng: random.Random, map_width: int, map_height: int) -> RectangularRoom:
+    room_width = rng.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+    room_height = rng.randint(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+    x = rng.randint(0, map_width - room_width - 1)
+    y = rng.randint(0, map_height - room_height - 1)
+    return RectangularRoom(x, y, room_width, room_height)
+
+
+def legacy_place_rooms(
+    map_width: int, map_height: int, max_rooms: int, seed: int = 0
+) -> List[RectangularRoom]:
+    """The pre-occupancy-grid implementation, testing every new room against every room."""
+    rng = random.Random(seed)
+    rooms: List[RectangularRoom] = []
+    for _ in range(max_rooms):
+        new_room = random_room(rng, map_width, map_height)
+        if any(new_room.intersects(other_room) for other_room in rooms):
+            continue
+        rooms.append(new_room)
+    return rooms
+
+
+def place_rooms(
+    map_width: int, map_height: int, max_rooms: int, seed: int = 0
+) -> List[RectangularRoom]:
+    rng = random.Random(seed)
+    occupancy = OccupancyGrid(map_width, map_height)
+    rooms: List[RectangularRoom] = []
+    for _ in range(max_rooms):
+        new_room = random_room(rng, map_width, map_height)
+        if not occupancy.is_free(new_room):
+            continue
+        occupancy.add(new_room)
+        rooms.append(new_room)
+    return rooms
+
+
+def time_placement(
+    place: Callable[[int, int, int], List[RectangularRoom]], size: Tuple[int, int, int]
+) -> Tuple[float, int]:
+    """Return the seconds taken and the number of rooms placed."""
+    start = time.perf_counter()
+    rooms = place(*size)
+    return time.perf_counter() - start, len(rooms)
+
+
+def main() -> None:
+    print(f"{'map':>12} {'max rooms':>10} {'rooms':>6} {'pairwise s':>11} {'grid s':>9}")
+    for size in ROOM_COUNTS:
+        legacy_time, legacy_rooms = time_placement(legacy_place_rooms, size)
+        grid_time, grid_rooms = time_placement(place_rooms, size)
+        assert legacy_rooms == grid_rooms
+        width, height, max_rooms = size
+        print(
+            f"{f'{width}x{height}':>12} {max_rooms:>10} {grid_rooms:>6}"
+            f" {legacy_time:>11.3f} {grid_time:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
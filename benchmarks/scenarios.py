@@ -0,0 +1,309 @@
+"""Seeded scenarios for the game's hot paths, swept across map sizes and entity counts."""
+from __future__ import annotations
+import itertools
+import os
+import random
+import tempfile
+from typing import Callable, Tuple
+
+import numpy as np
+import tcod
+
+import actions
+from benchmarks import entity_lookup, path_cost, room_placement, spawn
+from benchmarks.harness import benchmark
+import entity
+import entity_factories
+from engine import Engine
+import input_handlers
+from message_log import MessageLog
+import procgen
+import setup_game
+
+#(map width, map height, max rooms)
+MAP_SIZES = ((80, 45, 30), (200, 200, 300), (400, 400, 1000))
+
+#Removed along with its save files when the interpreter exits
+SAVE_DIRECTORY = tempfile.TemporaryDirectory(prefix="benchmarks-")
+
+
+def build_engine(width: int, height: int, max_rooms: int) -> Engine:
+    """Return a new game on a floor of the given size."""
+    return setup_game.new_game(map_width=width, map_height=height, max_rooms=max_rooms)
+
+
+def add_monsters(engine: Engine, number_of_monsters: int) -> None:
+    """Spawn goblins on random free floor tiles of the current floor."""
+    game_map = engine.game_map
+    xs, ys = np.nonzero(game_map.tiles["walkable"])
+    for index in random.sample(range(len(xs)), min(number_of_monsters, len(xs))):
+        x, y = int(xs[index]), int(ys[index])
+        if not game_map.get_entities_at_location(x, y):
+            entity_factories.goblin.spawn(game_map, x, y)
+
+
+def make_invulnerable(engine: Engine) -> None:
+    """Keep the player alive so repeated enemy turns measure the same kind of work."""
+    engine.player.fighter.base_defense = 1_000
+
+
+@benchmark("procgen.generate_dungeon", MAP_SIZES, repeat=3)
+def generate_dungeon(size: Tuple[int, int, int]) -> Callable[[], None]:
+    width, height, max_rooms = size
+    engine = build_engine(80, 45, 30)
+
+    def run() -> None:
+        procgen.generate_dungeon(
+            max_rooms=max_rooms,
+            room_min_size=6,
+            room_max_size=10,
+            map_width=width,
+            map_height=height,
+            engine=engine,
+        )
+    return run
+
+
+@benchmark("procgen.max_rooms", room_placement.ROOM_COUNTS, repeat=3)
+def generate_dungeon_max_rooms(size: Tuple[int, int, int]) -> Callable[[], None]:
+    return generate_dungeon(size)
+
+
+@benchmark("procgen.sample_free_regions", room_placement.ROOM_COUNTS, repeat=3)
+def generate_dungeon_sampling(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """Generation when every room is moved to free space, so the map fills up."""
+    width, height, max_rooms = size
+    engine = build_engine(80, 45, 30)
+
+    def run() -> None:
+        procgen.generate_floor_plan(
+            max_rooms=max_rooms,
+            room_min_size=6,
+            room_max_size=10,
+            map_width=width,
+            map_height=height,
+            floor_number=1,
+            rng=engine.game_world.get_rng("procgen", 1),
+            sample_free_regions=True,
+        )
+    return run
+
+
+@benchmark("procgen.place_entities", (100, 1_000, 10_000), repeat=5)
+def place_entities(number_of_rooms: int) -> Callable[[], None]:
+    """Populating a grid of 10x10 rooms with the spawn tables of a deep floor."""
+    rooms_per_side = int(number_of_rooms ** 0.5)
+    rooms = [
+        procgen.RectangularRoom(x * 12, y * 12, 10, 10)
+        for x in range(rooms_per_side)
+        for y in range(rooms_per_side)
+    ]
+
+    def run() -> None:
+        side = rooms_per_side * 12
+        floor_plan = procgen.FloorPlan(side, side, floor_number=8)
+        rng = random.Random(0)
+        for room in rooms:
+            procgen.place_entities(room, floor_plan, 8, rng)
+    return run
+
+
+@benchmark("procgen.build_game_map", MAP_SIZES, repeat=3)
+def build_game_map(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """Attaching a floor made ahead of time, what taking the stairs costs with pregeneration."""
+    width, height, max_rooms = size
+    engine = build_engine(80, 45, 30)
+    floor_plan = procgen.generate_floor_plan(
+        max_rooms=max_rooms,
+        room_min_size=6,
+        room_max_size=10,
+        map_width=width,
+        map_height=height,
+        floor_number=1,
+        rng=engine.game_world.get_rng("procgen", 1),
+    )
+    return lambda: procgen.build_game_map(floor_plan, engine)
+
+
+@benchmark("engine.update_fov", MAP_SIZES, repeat=5, number=20)
+def update_fov(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """A full FOV update, with the applied FOV and the cached masks dropped before each call."""
+    engine = build_engine(*size)
+
+    def run() -> None:
+        engine.game_map.invalidate_fov()
+        engine.game_map.fov_cache.clear()
+        engine.update_fov()
+    return run
+
+
+@benchmark("engine.update_fov_unmoved", MAP_SIZES, repeat=5, number=20)
+def update_fov_unmoved(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """update_fov when the player hasn't moved, which only checks the FOV already applied."""
+    engine = build_engine(*size)
+    return engine.update_fov
+
+
+@benchmark("engine.update_fov_moving", MAP_SIZES, repeat=5, number=20)
+def update_fov_moving(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """update_fov after the player moves to one of more places than the FOV cache holds."""
+    engine = build_engine(*size)
+    xs, ys = np.nonzero(engine.game_map.tiles["walkable"])
+    places = [(int(xs[i]), int(ys[i])) for i in random.choices(range(len(xs)), k=1_000)]
+    steps = iter(places * 1_000)
+
+    def run() -> None:
+        engine.player.place(*next(steps))
+        engine.update_fov()
+    return run
+
+
+@benchmark("engine.handle_enemy_turns", (10, 100, 1_000), repeat=5, number=5, fresh=True)
+def handle_enemy_turns(number_of_monsters: int) -> Callable[[], None]:
+    engine = build_engine(200, 200, 300)
+    make_invulnerable(engine)
+    add_monsters(engine, number_of_monsters)
+    engine.game_map.visible[:] = True #Every monster sees the player and gives chase.
+    engine.game_map.invalidate_fov()
+    return engine.handle_enemy_turns
+
+
+@benchmark("gamemap.render", MAP_SIZES, repeat=5, number=20)
+def render_map(size: Tuple[int, int, int]) -> Callable[[], None]:
+    width, height, _ = size
+    engine = build_engine(*size)
+    add_monsters(engine, width * height // 100)
+    engine.game_map.explored[:] = True
+    engine.game_map.invalidate_fov()
+    console = tcod.console.Console(width, height, order="F")
+    return lambda: engine.game_map.render(console)
+
+
+@benchmark("gamemap.render_after_fov", MAP_SIZES, repeat=5, number=20)
+def render_map_after_fov(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """Rendering when every frame follows a change of FOV, so nothing is cached."""
+    width, height, _ = size
+    engine = build_engine(*size)
+    add_monsters(engine, width * height // 100)
+    engine.game_map.explored[:] = True
+    console = tcod.console.Console(width, height, order="F")
+
+    def run() -> None:
+        engine.game_map.invalidate_fov()
+        engine.game_map.render(console)
+    return run
+
+
+@benchmark("engine.render_camera", MAP_SIZES, repeat=5, number=20)
+def render_camera(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """A whole frame on an 80x50 screen after a change of FOV, whatever the size of the map."""
+    width, height, _ = size
+    engine = build_engine(*size)
+    add_monsters(engine, width * height // 100)
+    engine.game_map.explored[:] = True
+    console = tcod.console.Console(80, 50, order="F")
+
+    def run() -> None:
+        engine.game_map.invalidate_fov()
+        engine.render(console)
+    return run
+
+
+@benchmark("messagelog.render", (10, 1_000, 100_000), repeat=5, number=50)
+def render_messages(number_of_messages: int) -> Callable[[], None]:
+    engine = build_engine(80, 45, 30)
+    for i in range(number_of_messages):
+        engine.message_log.add_message(f"Message number {i} is long enough to wrap twice in the log")
+    console = tcod.console.Console(80, 50, order="F")
+    return lambda: engine.message_log.render(console=console, x=21, y=45, width=40, height=5)
+
+
+@benchmark("history_viewer.scroll", (1_000, 100_000), repeat=5, number=50)
+def scroll_history(number_of_messages: int) -> Callable[[], None]:
+    """A frame of the history viewer after scrolling up a page, once the viewer is open."""
+    engine = build_engine(80, 45, 30)
+    engine.message_log = MessageLog(capacity=number_of_messages)
+    for i in range(number_of_messages):
+        engine.message_log.add_message(f"Message number {i} is long enough to wrap twice in the log")
+    console = tcod.console.Console(80, 50, order="F")
+    viewer = input_handlers.HistoryViewer(engine)
+    viewer.on_render(console)
+
+    def run() -> None:
+        viewer.cursor = (viewer.cursor - 10) % viewer.log_length
+        viewer.on_render(console)
+    return run
+
+
+def save_file(engine: Engine) -> str:
+    filename = os.path.join(SAVE_DIRECTORY.name, f"{id(engine)}.sav")
+    engine.save_as(filename)
+    return filename
+
+
+@benchmark("engine.save_as", MAP_SIZES, repeat=3)
+def save_as(size: Tuple[int, int, int]) -> Callable[[], None]:
+    engine = build_engine(*size)
+    filename = save_file(engine)
+    return lambda: engine.save_as(filename)
+
+
+@benchmark("setup_game.load_game", MAP_SIZES, repeat=3)
+def load_game(size: Tuple[int, int, int]) -> Callable[[], None]:
+    filename = save_file(build_engine(*size))
+    return lambda: setup_game.load_game(filename)
+
+
+@benchmark("gamemap.entity_move", (10, 1_000, 10_000), repeat=5)
+def entity_move(number_of_entities: int) -> Callable[[], None]:
+    game_map = entity_lookup.build_floor(number_of_entities)
+    return lambda: entity_lookup.time_moves(game_map, moves=2_000)
+
+
+@benchmark("ai.get_path_to", ((80, 45), (1000, 1000)), repeat=3)
+def get_path_to(size: Tuple[int, int]) -> Callable[[], None]:
+    game_map, hunter = path_cost.build_floor(*size)
+    player = game_map.engine.player
+    return lambda: hunter.ai.get_path_to(player.x, player.y)
+
+
+@benchmark("actor_store.area_query", (100, 1_000, 10_000), repeat=5, number=100)
+def area_query(number_of_actors: int) -> Callable[[], None]:
+    game_map = entity_lookup.build_floor(number_of_actors)
+    center = game_map.width // 2, game_map.height // 2
+    return lambda: game_map.actor_store.get_actors_within_radius(*center, 3)
+
+
+@benchmark("entity.spawn", (1_000, 10_000), repeat=3)
+def spawn_monsters(number_of_monsters: int) -> Callable[[], None]:
+    return lambda: spawn.time_spawns(entity.Entity.spawn, number_of_monsters)
+
+
+@benchmark("game_world.backtrack", MAP_SIZES, repeat=3, number=5)
+def backtrack(size: Tuple[int, int, int]) -> Callable[[], None]:
+    """Going up and back down the stairs, with both floors restored from their compressed form."""
+    engine = build_engine(*size)
+    game_world = engine.game_world
+    game_world.floor_cache.floors_in_memory = 0
+    game_world.generate_floor()
+
+    def run() -> None:
+        game_world.ascend()
+        game_world.generate_floor()
+    return run
+
+
+@benchmark("caves.turn", (512, 2_048, 8_192), repeat=3, number=20)
+def cave_turn(size: int) -> Callable[[], None]:
+    """A turn of walking through a cave floor, which only works on the chunks around the player."""
+    engine = setup_game.new_game(map_width=size, map_height=size, caves=True)
+    make_invulnerable(engine)
+    handler = input_handlers.EventHandler(engine)
+    console = tcod.console.Console(80, 50, order="F")
+    directions = itertools.cycle([(1, 0)] * 40 + [(0, 1)] * 40 + [(-1, 0)] * 40 + [(0, -1)] * 40)
+
+    def run() -> None:
+        if not handler.handle_action(actions.BumpAction(engine.player, *next(directions))):
+            handler.handle_action(actions.WaitAction(engine.player))
+        engine.render(console)
+    return run
@@ -0,0 +1,71 @@
+"""Spawn throughput of prototype cloning against the old deepcopy, on a crowded floor.
+
+Run from the project root with `python -m benchmarks.spawn`.
+"""
+from __future__ import annotations
+import copy
+import random
+import time
+from typing import Callable, List, Tuple
+
+import entity_factories
+from engine import Engine
+from entity import Entity
+from game_map import GameMap
+import tile_types
+
+MONSTERS = 10_000
+PROTOTYPES = (entity_factories.goblin, entity_factories.orc, entity_factories.ogre)
+
+
+def build_floor(number_of_monsters: int = MONSTERS) -> GameMap:
+    """Return an empty open floor with room for `number_of_monsters`."""
+    side = max(32, int((number_of_monsters * 4) ** 0.5))
+    engine = Engine(player=entity_factories.player.clone())
+    game_map = GameMap(engine, side, side)
+    game_map.tiles[...] = tile_types.floor
+    engine.game_map = game_map
+    engine.player.place(0, 0, game_map)
+    return game_map
+
+
+def legacy_spawn(prototype: Entity, gamemap: GameMap, x: int, y: int) -> Entity:
+    """The pre-prototype implementation, deep copying the whole template."""
+    clone = copy.deepcopy(prototype)
+    clone.x = x
+    clone.y = y
+    clone.parent = gamemap
+    gamemap.add_entity(clone)
+    return clone
+
+
+def plan_spawns(game_map: GameMap, number_of_monsters: int, seed: int = 0) -> List[Tuple[Entity, int, int]]:
+    rng = random.Random(seed)
+    side = game_map.width
+    locations = rng.sample(range(1, side * side), number_of_monsters)
+    return [(rng.choice(PROTOTYPES), location % side, location // side) for location in locations]
+
+
+def time_spawns(
+    spawn: Callable[[Entity, GameMap, int, int], Entity],
+    number_of_monsters: int = MONSTERS,
+    seed: int = 0,
+) -> float:
+    """Return the seconds taken to spawn `number_of_monsters` on a fresh floor."""
+    game_map = build_floor(number_of_monsters)
+    plan = plan_spawns(game_map, number_of_monsters, seed)
+    start = time.perf_counter()
+    for prototype, x, y in plan:
+        spawn(prototype, game_map, x, y)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'implementation':<16} {'seconds':>10} {'spawns/s':>12}")
+    for name, spawn in (("deepcopy", legacy_spawn), ("prototype", Entity.spawn)):
+        elapsed = time_spawns(spawn)
+        print(f"{name:<16} {elapsed:>10.3f} {MONSTERS / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+from typing import Tuple, TYPE_CHECKING
+from fov_cache import Window
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+
+class Camera:
+    """The part of the map drawn on screen, a `width` by `height` view from the console's
+    top left corner. It follows the player on maps larger than the view and keeps the
+    view inside the map, maps smaller than the view are drawn from their corner.
+    """
+
+    def __init__(self, width: int = 80, height: int = 45):
+        self.width = width
+        self.height = height
+        #The map position drawn at the top left of the view
+        self.x = 0
+        self.y = 0
+        #Size of the map last followed, the view never reaches past it
+        self.map_width = width
+        self.map_height = height
+
+    def follow(self, game_map: GameMap, x: int, y: int) -> None:
+        """Center the view on (x, y) of `game_map`, as far as the map's edges allow."""
+        self.map_width, self.map_height = game_map.width, game_map.height
+        self.x = min(max(x - self.width // 2, 0), max(game_map.width - self.width, 0))
+        self.y = min(max(y - self.height // 2, 0), max(game_map.height - self.height, 0))
+
+    @property
+    def window(self) -> Window:
+        """The map tiles inside the view."""
+        return (
+            slice(self.x, min(self.x + self.width, self.map_width)),
+            slice(self.y, min(self.y + self.height, self.map_height)),
+        )
+
+    def map_to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        return x - self.x, y - self.y
+
+    def screen_to_map(self, x: int, y: int) -> Tuple[int, int]:
+        return x + self.x, y + self.y
+
+    def is_on_screen(self, x: int, y: int) -> bool:
+        """Return True if the map position (x, y) is inside the view."""
+        return 0 <= x - self.x < self.width and 0 <= y - self.y < self.height
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+import numpy as np
+
+ChunkKey = Tuple[int, int]
+#(chunk key, slices within the chunk, slices within the window)
+Piece = Tuple[ChunkKey, Tuple[slice, slice], Tuple[slice, slice]]
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+class ChunkedArray:
+    """A 2D array kept as square chunks, each allocated the first time it's written to.
+    Reading an unallocated chunk gives `fill_value`, so memory follows the written area.
+    Indexing covers what the game asks of its map arrays: single tiles, windows of two
+    slices, pairs of index arrays, and field names, which give a `ChunkedField`.
+    Windows are returned as new dense arrays, writes to them don't reach the chunks.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        dtype: Any,
+        fill_value: Any,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.fill_value = np.array(fill_value, dtype=self.dtype)
+        self.chunk_size = chunk_size
+        self.chunks: Dict[ChunkKey, np.ndarray] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self.chunks.values())
+
+    def allocate(self, key: ChunkKey) -> np.ndarray:
+        """Return the chunk at this key, making it if it doesn't exist."""
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = np.full((self.chunk_size, self.chunk_size), self.fill_value, order="F")
+            self.chunks[key] = chunk
+        return chunk
+
+    def chunk_window(self, key: ChunkKey) -> Tuple[slice, slice]:
+        """Return the part of the array a chunk covers."""
+        size = self.chunk_size
+        chunk_x, chunk_y = key
+        return (
+            slice(chunk_x * size, min((chunk_x + 1) * size, self.shape[0])),
+            slice(chunk_y * size, min((chunk_y + 1) * size, self.shape[1])),
+        )
+
+    def get_chunk_keys(self, window: Tuple[slice, slice]) -> Iterator[ChunkKey]:
+        """Iterate over the keys of the chunks overlapping a window."""
+        (x_start, x_stop), (y_start, y_stop) = self.bounds(window)
+        size = self.chunk_size
+        for chunk_x in range(x_start // size, (x_stop - 1) // size + 1):
+            for chunk_y in range(y_start // size, (y_stop - 1) // size + 1):
+                yield chunk_x, chunk_y
+
+    def bounds(self, window: Tuple[slice, slice]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        x_start, x_stop, _ = window[0].indices(self.shape[0])
+        y_start, y_stop, _ = window[1].indices(self.shape[1])
+        return (x_start, max(x_start, x_stop)), (y_start, max(y_start, y_stop))
+
+    def get_pieces(self, window: Tuple[slice, slice]) -> Iterator[Piece]:
+        """Split a window into the parts falling in each chunk."""
+        (x_start, x_stop), (y_start, y_stop) = self.bounds(window)
+        if x_start == x_stop or y_start == y_stop:
+            return
+        size = self.chunk_size
+        for key in self.get_chunk_keys(window):
+            chunk_x, chunk_y = key
+            left, top = chunk_x * size, chunk_y * size
+            piece_x = slice(max(x_start, left), min(x_stop, left + size))
+            piece_y = slice(max(y_start, top), min(y_stop, top + size))
+            yield (
+                key,
+                (slice(piece_x.start - left, piece_x.stop - left), slice(piece_y.start - top, piece_y.stop - top)),
+                (slice(piece_x.start - x_start, piece_x.stop - x_start), slice(piece_y.start - y_start, piece_y.stop - y_start)),
+            )
+
+    def check_index(self, x: int, y: int) -> None:
+        if not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+            raise IndexError(f"({x}, {y}) is outside of a {self.shape} array")
+
+    def read(self, key: Any, field: Optional[str] = None) -> Any:
+        fill_value = self.fill_value if field is None else self.fill_value[field]
+        x, y = key
+        size = self.chunk_size
+        if isinstance(x, slice):
+            (x_start, x_stop), (y_start, y_stop) = self.bounds(key)
+            window = np.empty((x_stop - x_start, y_stop - y_start), dtype=fill_value.dtype, order="F")
+            window[...] = fill_value
+            for chunk_key, chunk_slices, window_slices in self.get_pieces(key):
+                chunk = self.chunks.get(chunk_key)
+                if chunk is not None:
+                    window[window_slices] = chunk[chunk_slices] if field is None else chunk[field][chunk_slices]
+            return window
+        if isinstance(x, np.ndarray):
+            xs, ys = np.asarray(x), np.asarray(y)
+            values = np.empty(xs.shape, dtype=fill_value.dtype)
+            values[...] = fill_value
+            chunk_xs, chunk_ys = xs // size, ys // size
+            for chunk_key in set(zip(chunk_xs.ravel().tolist(), chunk_ys.ravel().tolist())):
+                chunk = self.chunks.get(chunk_key)
+                if chunk is None:
+                    continue
+                in_chunk = (chunk_xs == chunk_key[0]) & (chunk_ys == chunk_key[1])
+                if field is not None:
+                    chunk = chunk[field]
+                values[in_chunk] = chunk[xs[in_chunk] % size, ys[in_chunk] % size]
+            return values
+        x, y = int(x), int(y)
+        self.check_index(x, y)
+        chunk = self.chunks.get((x // size, y // size))
+        if chunk is None:
+            return fill_value[()]
+        return chunk[x % size, y % size] if field is None else chunk[field][x % size, y % size]
+
+    def write(self, key: Any, value: Any, field: Optional[str] = None) -> None:
+        if key is Ellipsis:
+            if field is not None:
+                raise IndexError("Fields of a chunked array can't be filled as a whole")
+            #Every element takes the value, so no chunk is needed to hold it
+            self.chunks.clear()
+            self.fill_value = np.array(value, dtype=self.dtype)
+            return
+        x, y = key
+        size = self.chunk_size
+        if isinstance(x, slice):
+            value = np.asanyarray(value)
+            for chunk_key, chunk_slices, window_slices in self.get_pieces(key):
+                chunk = self.allocate(chunk_key)
+                if field is not None:
+                    chunk = chunk[field]
+                chunk[chunk_slices] = value[window_slices] if value.ndim >= 2 else value
+            return
+        x, y = int(x), int(y)
+        self.check_index(x, y)
+        chunk = self.allocate((x // size, y // size))
+        if field is not None:
+            chunk = chunk[field]
+        chunk[x % size, y % size] = value
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            return ChunkedField(self, key)
+        return self.read(key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.write(key, value)
+
+
+class ChunkedField:
+    """One field of a structured ChunkedArray, sharing its chunks."""
+
+    def __init__(self, array: ChunkedArray, field: str):
+        self.array = array
+        self.field = field
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.array.shape
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.array.read(key, self.field)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.array.write(key, value, self.field)
+
+
+MapArray = Union[np.ndarray, ChunkedArray]
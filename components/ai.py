@@ -1,46 +1,61 @@
 from __future__ import annotations
-from typing import List, Optional, Tuple, TYPE_CHECKING
-import random
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING, Union
 import numpy as np # type: ignore
 import tcod
 from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
 from components.base_component import BaseComponent
 
 if TYPE_CHECKING:
+    from engine import Engine
     from entity import Actor
 
+#Steps to the neighboring tiles in the order tcod.path.hillclimb2d prefers them on ties
+NEIGHBORS = np.array(
+    [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)], dtype=np.int32
+)
+#Flow field cost of each of those steps onto a free floor tile, cardinal=2 and diagonal=3
+NEIGHBOR_COSTS = np.array([2, 2, 2, 2, 3, 3, 3, 3], dtype=np.int64)
+
+#A hostile's decision for its next turn, made by plan_hostile_turns
+Melee = Tuple[int, int] #Direction of the attack
+Chase = List[Tuple[int, int]] #Downhill tiles on the flow field, best first
+Plan = Union[Melee, Chase, None] #None when the player isn't in sight
+
 class BaseAI(Action):
     entity: Actor
     
     def perform(self) -> None:
         raise NotImplementedError()
     
+    def clone(self, entity: Actor) -> BaseAI:
+        """Return a copy of this AI driving `entity`."""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.entity = entity
+        return clone
+    
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
         If there is no valid path then returns an empty list.
         """
-        #Copy the walkable array.
-        
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
-        
-        for entity in self.entity.gamemap.entities:
-            # Check that an entity blocks movement and the cost isn't zero(blocking).
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                """ Add to the cost of a blocked position.
-                 A lower number means more enemies will crowed behind each other
-                 in hallways. A higher number means enemies will take longer in paths
-                 in order to surround the player. 
-                 """
-                cost[entity.x, entity.y] += 10
+        gamemap = self.entity.gamemap
+        cost = gamemap.get_path_cost()
+        #The cost array covers the active window of the map, paths can't leave it
+        origin_x, origin_y = gamemap.active_origin
+        start = self.entity.x - origin_x, self.entity.y - origin_y
+        dest = dest_x - origin_x, dest_y - origin_y
+        width, height = cost.shape
+        if not (0 <= start[0] < width and 0 <= start[1] < height and 0 <= dest[0] < width and 0 <= dest[1] < height):
+            return []
         # Create a graph from the cost array and pass that graph to a new pathfinder.       
         graph = tcod.path.SimpleGraph(cost = cost, cardinal = 2, diagonal = 3)
         pathfinder = tcod.path.Pathfinder(graph)
         
-        pathfinder.add_root((self.entity.x, self.entity.y))
+        pathfinder.add_root(start)
        # Compute the path to the destination and remove the starting point. 
-        path: List[List[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+        path: List[List[int]] = pathfinder.path_to(dest)[1:].tolist()
        # Convert from list[List[int]] to List[Tuple[int, int]].
-        return [(index[0], index[1]) for index in path]
+        return [(index[0] + origin_x, index[1] + origin_y) for index in path]
 
 class ConfusedEnemy(BaseAI):
     """
@@ -54,6 +69,12 @@ class ConfusedEnemy(BaseAI):
         
         self.previous_ai = previous_ai
         self.turns_remaining = turns_remaining
+    
+    def clone(self, entity: Actor) -> ConfusedEnemy:
+        clone = super().clone(entity)
+        if self.previous_ai:
+            clone.previous_ai = self.previous_ai.clone(entity)
+        return clone
         
     def perform(self) -> None:
         #Revert the AI back to the original state if the effect has run its course
@@ -64,7 +85,7 @@ class ConfusedEnemy(BaseAI):
             self.entity.ai = self.previous_ai
         else:
             #Pick a random direction
-            direction_x, direction_y = random.choice(
+            direction_x, direction_y = self.engine.game_world.rng.choice(
                 [
                     (-1, -1), #Northwest
                     (0, -1), #North
@@ -83,23 +104,103 @@ class ConfusedEnemy(BaseAI):
             #Its possible the actor will just bump in the wall, wasting a turn
             return BumpAction(self.entity, direction_x, direction_y,).perform()
     
+def plan_hostile_turns(engine: Engine, hostiles: Sequence[Actor]) -> List[Plan]:
+    """Decide the next turn of every hostile at once, from the actor store columns.
+    Hostiles the player can see attack when adjacent, otherwise they chase the player
+    down the flow field. Each chase lists every downhill step so a later mover can take
+    another if the best one gets blocked.
+    """
+    game_map = engine.game_map
+    player = engine.player
+    store = game_map.actor_store
+    ids = np.fromiter((store.ids[hostile] for hostile in hostiles), dtype=np.intp, count=len(hostiles))
+    xs, ys = store.x[ids], store.y[ids]
+    dx, dy = player.x - xs, player.y - ys
+    in_sight = game_map.visible[xs, ys]
+    adjacent = np.maximum(np.abs(dx), np.abs(dy)) <= 1 #Chebyshev distance.
+    chasing = np.flatnonzero(in_sight & ~adjacent)
+    
+    plans: List[Plan] = [None] * len(hostiles)
+    for i in np.flatnonzero(in_sight & adjacent).tolist():
+        plans[i] = (int(dx[i]), int(dy[i]))
+    if not len(chasing):
+        return plans
+    
+    #The flow field may only cover part of the map, indexes are relative to its origin
+    distance = game_map.get_flow_field(player.x, player.y)
+    width, height = distance.shape
+    origin_x, origin_y = game_map.flow_field_origin
+    chase_xs, chase_ys = xs[chasing], ys[chasing]
+    neighbor_xs = chase_xs[:, np.newaxis] + NEIGHBORS[:, 0]
+    neighbor_ys = chase_ys[:, np.newaxis] + NEIGHBORS[:, 1]
+    
+    def distance_at(map_xs: np.ndarray, map_ys: np.ndarray) -> np.ndarray:
+        window_xs, window_ys = map_xs - origin_x, map_ys - origin_y
+        return np.where(
+            (window_xs >= 0) & (window_xs < width) & (window_ys >= 0) & (window_ys < height),
+            distance[window_xs.clip(0, width - 1), window_ys.clip(0, height - 1)],
+            np.iinfo(distance.dtype).max,
+        )
+    
+    neighbor_distance = distance_at(neighbor_xs, neighbor_ys).astype(np.int64)
+    #A hostile's own tile carries the blocker cost of the hostile standing on it, which
+    #would make steps away from the player look downhill. Steps are measured against the
+    #distance the tile would have if it were free instead.
+    free_distance = np.minimum(
+        distance_at(chase_xs, chase_ys), (neighbor_distance + NEIGHBOR_COSTS).min(axis=1)
+    )
+    order = np.argsort(neighbor_distance, axis=1, kind="stable")
+    downhill = np.take_along_axis(neighbor_distance, order, axis=1) < free_distance[:, np.newaxis]
+    step_xs = np.take_along_axis(neighbor_xs, order, axis=1).tolist()
+    step_ys = np.take_along_axis(neighbor_ys, order, axis=1).tolist()
+    for row, (i, steps) in enumerate(zip(chasing.tolist(), downhill.sum(axis=1).tolist())):
+        plans[i] = list(zip(step_xs[row][:steps], step_ys[row][:steps]))
+    return plans
+
 class HostileEnemy(BaseAI):
+    #Set by plan_hostile_turns for the coming turn, HostileEnemy plans for itself otherwise
+    plan: Optional[Plan] = None
+    planned = False
+    #Where the player was last seen, the enemy heads there once it loses sight of them
+    last_target: Optional[Tuple[int, int]] = None
+    
     def __init__(self, entity:Actor):
         super().__init__(entity)
         self.path: List[Tuple[int, int]] = []
     
+    def clone(self, entity: Actor) -> HostileEnemy:
+        clone = super().clone(entity)
+        clone.path = list(self.path)
+        return clone
+    
     def perform(self) -> None:
-        target = self.engine.player
-        dx = target.x - self.entity.x
-        dy = target.y - self.entity.y
-        distance = max(abs(dx), abs(dy)) #Chebyshev distance.
+        if self.planned:
+            plan = self.plan
+            self.plan, self.planned = None, False
+        else:
+            plan = plan_hostile_turns(self.engine, [self.entity])[0]
+        
+        if isinstance(plan, tuple):
+            self.last_target = None
+            self.path = []
+            return MeleeAction(self.entity, *plan).perform()
+        
+        if plan is not None:
+            target = self.engine.player
+            self.last_target = target.x, target.y
+            self.path = []
+            for dest_x, dest_y in plan:
+                #Steps taken by enemies that moved earlier this turn are skipped
+                if not self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y):
+                    return MovementAction(
+                        self.entity, dest_x - self.entity.x, dest_y - self.entity.y,
+                    ).perform()
+            return WaitAction(self.entity).perform()
+        
+        if self.last_target:
+            self.path = self.get_path_to(*self.last_target)
+            self.last_target = None
         
-        if self.engine.game_map.visible[self.entity.x, self.entity.y]:
-            if distance <= 1:
-                return MeleeAction(self.entity, dx, dy).perform()
-            
-            self.path = self.get_path_to(target.x, target.y)
-            
         if self.path:
             dest_x, dest_y = self.path.pop(0)
             return MovementAction (
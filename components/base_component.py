@@ -1,14 +1,24 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TypeVar, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
     from game_map import GameMap
+
+T = TypeVar("T", bound="BaseComponent")
     
 class BaseComponent:
     parent: Entity #Owns instance of entity
     
+    def clone(self: T) -> T:
+        """Return a shallow copy of this component, the new owner sets its parent.
+        Components holding mutable state must override this to copy it.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        return clone
+    
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
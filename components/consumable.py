@@ -108,13 +108,14 @@ class PyroclasmDamageConsumable(Consumable):
             raise Impossible("You can't hit what you can't see")
         
         targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
-                self.engine.message_log.add_message(
-                    f"The {actor.name} is bombarded with explosive flames, taking {self.damage} damage!"
-                )
-                actor.fighter.take_damage(self.damage)
-                targets_hit = True
+        for actor in self.engine.game_map.actor_store.get_actors_within_radius(
+            *target_xy, self.radius
+        ):
+            self.engine.message_log.add_message(
+                f"The {actor.name} is bombarded with explosive flames, taking {self.damage} damage!"
+            )
+            actor.fighter.take_damage(self.damage)
+            targets_hit = True
         if not targets_hit:
             raise Impossible("There are no targets within the radius")
         self.consume()
@@ -126,16 +127,13 @@ class LightningDamageConsumable(Consumable):
         
     def activate(self, action: actions.ItemAction) -> None:
         consumer = action.entity
-        target = None
-        closest_distance = self.maximum_range + 1.0
-        
-        for actor in self.engine.game_map.actors:
-            if actor is not consumer and self.parent.gamemap.visible[actor.x, actor.y]:
-                distance = consumer.distance(actor.x, actor.y)
-                
-                if distance < closest_distance:
-                    target = actor
-                    closest_distance = distance
+        target = self.engine.game_map.actor_store.get_nearest_actor(
+            consumer.x,
+            consumer.y,
+            maximum_distance=self.maximum_range + 1.0,
+            visible=self.parent.gamemap.visible,
+            exclude=consumer,
+        )
         
         if target:
             self.engine.message_log.add_message(
@@ -170,13 +168,14 @@ class BlizzardDamageConsumable(Consumable):
             raise Impossible("You can't hit what you can't see")
         
         targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
-                self.engine.message_log.add_message(
-                    f"The {actor.name} is pelted by shards of ice, taking {self.damage} damage"
-                )
-                actor.fighter.take_damage(self.damage)
-                targets_hit = True
+        for actor in self.engine.game_map.actor_store.get_actors_within_radius(
+            *target_xy, self.radius
+        ):
+            self.engine.message_log.add_message(
+                f"The {actor.name} is pelted by shards of ice, taking {self.damage} damage"
+            )
+            actor.fighter.take_damage(self.damage)
+            targets_hit = True
         if not targets_hit:
             raise Impossible("There are no targets within the radius")
         self.consume()
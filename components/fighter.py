@@ -25,6 +25,7 @@ class Fighter(BaseComponent):
         self._hp = max(0, min(value, self.max_hp))
         if self._hp == 0 and self.parent.ai:
             self.die()
+        self.gamemap.actor_store.update(self.parent)
     
     @property
     def defense(self) -> int:
@@ -59,7 +60,7 @@ class Fighter(BaseComponent):
         
         self.parent.char = "%"
         self.parent.color = (0, 0, 200)
-        self.parent.blocks_movement = False
+        self.gamemap.set_blocks_movement(self.parent, False)
         self.parent.ai = None
         self.parent.name = f"remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
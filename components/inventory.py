@@ -11,6 +11,13 @@ class Inventory(BaseComponent):
     def __init__(self, capacity: int):
         self.capacity = capacity
         self.items: List[Item] = []
+    
+    def clone(self) -> Inventory:
+        clone = super().clone()
+        clone.items = [item.clone() for item in self.items]
+        for item in clone.items:
+            item.parent = clone
+        return clone
         
     def drop(self, item: Item) -> None:
         """
@@ -1,18 +1,19 @@
 from __future__ import annotations
-import lzma
-import pickle
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
 from tcod.context import Context
 from tcod.console import Console
-from tcod.map import compute_fov
+from camera import Camera
+from components.ai import HostileEnemy, plan_hostile_turns
 from entity import Actor
 from game_map import GameMap
 import exceptions
 from message_log import MessageLog
+from perf import timings
 import render_functions
 
 
 if TYPE_CHECKING:
+    from autosave import Autosaver
     from entity import Entity
     from game_map import GameMap, GameWorld
 
@@ -23,17 +24,26 @@ class Engine:
     #forced uniqueness using a set because adding an entity to the set twice doesn't make sense
     def __init__(self, player: Actor):
         self.message_log = MessageLog()
-        self.mouse_location = (0, 0)
+        self.camera = Camera() #The map is drawn above the 5 rows of status below
+        self.mouse_location = (0, 0) #Map position under the mouse or targeting cursor
         self.player = player
+        self.autosaver: Optional[Autosaver] = None
         
-    def save_as(self, filename: str) -> None:
-        #Save this Engine instance as a compressed file
-        save_data = lzma.compress(pickle.dumps(self))#serializes object hierarchy in python and compresses the data
-        with open(filename, "wb") as f:
-            f.write(save_data)
+    def save_as(self, filename: str, codec: str = "zlib") -> None:
+        #Save this Engine instance as a compressed file, see savefile for the format
+        import savefile
+        
+        savefile.save(self, filename, codec)
      
     def handle_enemy_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
+        #Actors moved last turn, so the shared pathing distances are stale
+        self.game_map.clear_flow_field()
+        actors = [actor for actor in self.game_map.get_active_actors() if actor is not self.player]
+        #Hostiles decide together from numpy columns, then act one by one below
+        hostiles = [actor for actor in actors if isinstance(actor.ai, HostileEnemy)]
+        for hostile, plan in zip(hostiles, plan_hostile_turns(self, hostiles)):
+            hostile.ai.plan, hostile.ai.planned = plan, True
+        for entity in actors:
             #Fairly sure this is printing every npc that on the generated dungeon floor
             #Changed this from printing presence of enemy to using ai for movement
             if entity.ai:
@@ -44,19 +54,34 @@ class Engine:
                     
                
     def update_fov(self) -> None:
-        """Recompute the visible area based on the players point of view."""
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.x, self.player.y),
-            radius=8,
-        )
+        """Recompute the visible area based on the players point of view.
+        Masks are cached by position and tiles version, so turns without a move are free.
+        """
+        game_map = self.game_map
+        #Large maps generate what's around the player first, which may change the tiles
+        game_map.update_active_window(self.player.x, self.player.y)
+        key = (self.player.x, self.player.y, 8, game_map.tiles_version)
+        if key == game_map.fov_key:
+            return #Explored already holds every visible tile, the cached graphics stand.
+        
+        window, mask = game_map.fov_cache.get(game_map.tiles["transparent"], *key)
+        if game_map.fov_window is None:
+            game_map.visible[...] = False
+        else:
+            game_map.visible[game_map.fov_window] = False
+        game_map.visible[window] = mask
         #If a tiles is "visible" it should be added to "explored".
-        self.game_map.explored |= self.game_map.visible
+        game_map.explored[window] |= mask
+        game_map.invalidate_fov()
+        game_map.fov_key, game_map.fov_window = key, window
         
     def render(self, console: Console) -> None:
-        self.game_map.render(console)
+        self.camera.follow(self.game_map, self.player.x, self.player.y)
+        with timings.phase("GameMap.render"):
+            self.game_map.render(console, self.camera.window)
         
-        self.message_log.render(console=console, x=21, y=45, width=40, height=5)
+        with timings.phase("MessageLog.render"):
+            self.message_log.render(console=console, x=21, y=45, width=40, height=5)
         
         render_functions.render_bar(
             console=console,
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import copy
 import math
 from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
 from render_order import RenderOrder
@@ -42,31 +41,43 @@ class Entity:
         if parent:
             #If parent(gamemap) isn't provided now then it will be set later
             self.parent = parent 
-            parent.entities.add(self)
+            parent.add_entity(self)
     
     @property
     def gamemap(self) -> GameMap:
         return self.parent.gamemap
     
+    def clone(self: T) -> T:
+        """Return a copy of this entity that isn't placed on any map.
+        Components are copied explicitly by the subclasses, everything else on an
+        entity is immutable and shared with the prototype.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__.pop("parent", None)
+        return clone
+    
     def spawn(self: T, gamemap: GameMap, x: int, y: int)-> T:
         """Spawn a copy of this instance at the give location."""
-        clone = copy.deepcopy(self)
+        clone = self.clone()
         clone.x = x
         clone.y = y
         clone.parent = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
         return clone
         
     def place(self, x: int, y: int, gamemap: Optional[GameMap] = None) -> None:
         """Place this entity in a new location. Handles moving across GameMaps."""
+        if hasattr(self, "parent") and self.parent is self.gamemap: #Possibly uninitialized
+            if gamemap is None or gamemap is self.parent:
+                self.parent.move_entity(self, x, y)
+                return
+            self.parent.remove_entity(self)
         self.x = x
         self.y = y
         if gamemap:
-            if hasattr(self, "parent"): #Possibly uninitialized
-                if self.parent is self.gamemap:
-                    self.parent.entities.remove(self)
             self.parent =  gamemap 
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
     
     def distance(self, x: int, y: int) -> float:
         """
@@ -76,8 +87,7 @@ class Entity:
     
     def move(self, dx: int, dy: int) -> None:
         #Move entity by amount given
-        self.x += dx
-        self.y += dy
+        self.place(self.x + dx, self.y + dy)
         
 class Actor(Entity):
     def __init__(
@@ -116,6 +126,24 @@ class Actor(Entity):
         self.inventory.parent = self
         self.level = level
         self.level.parent = self
+    
+    def clone(self) -> Actor:
+        clone = super().clone()
+        clone.ai = self.ai.clone(clone) if self.ai else None
+        for name in ("fighter", "inventory", "level", "equipment"):
+            component = getattr(self, name).clone()
+            component.parent = clone
+            setattr(clone, name, component)
+        #Equipped items live in the inventory, so point the slots at their copies
+        for slot in ("weapon", "armor"):
+            item = getattr(self.equipment, slot)
+            if item is not None:
+                if item in self.inventory.items:
+                    item = clone.inventory.items[self.inventory.items.index(item)]
+                else:
+                    item = item.clone()
+                setattr(clone.equipment, slot, item)
+        return clone
         
     @property
     def is_alive(self) -> bool:
@@ -153,4 +181,13 @@ class Item(Entity):
         
         if self.equippable:
             self.equippable.parent = self
-        
\ No newline at end of file
+    
+    def clone(self) -> Item:
+        clone = super().clone()
+        for name in ("consumable", "equippable"):
+            component = getattr(self, name)
+            if component is not None:
+                component = component.clone()
+                component.parent = clone
+                setattr(clone, name, component)
+        return clone
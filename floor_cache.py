@@ -0,0 +1,130 @@
+from __future__ import annotations
+from collections import OrderedDict
+import os
+import tempfile
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from game_map import GameMap
+
+
+class FloorCache:
+    """The floors the player has left, so they can be walked back to.
+    The `floors_in_memory` most recently left floors are kept as they are. Older floors are
+    compressed, and once those take more than `max_compressed_bytes` the oldest of them are
+    written out to files, so memory use stays the same however long the run.
+    """
+
+    def __init__(self, floors_in_memory: int = 2, max_compressed_bytes: int = 16 * 1024 * 1024):
+        self.floors_in_memory = floors_in_memory
+        self.max_compressed_bytes = max_compressed_bytes
+        self.game_maps: OrderedDict[int, GameMap] = OrderedDict()
+        self.compressed: OrderedDict[int, bytes] = OrderedDict()
+        self.compressed_bytes = 0
+        self.spilled: Dict[int, str] = {} #Floor number -> file name
+        #Uncompressed `encode_floor` output of floors kept as they are, made by `export`.
+        #Cached floors don't change, so each is only encoded once however often it's saved.
+        self.snapshots: Dict[int, bytes] = {}
+        #Made on the first spill, removed along with its files when the interpreter exits
+        self.directory: Optional[tempfile.TemporaryDirectory[str]] = None
+
+    def __contains__(self, floor: int) -> bool:
+        return floor in self.game_maps or floor in self.compressed or floor in self.spilled
+
+    def __len__(self) -> int:
+        return len(self.game_maps) + len(self.compressed) + len(self.spilled)
+
+    def put(self, floor: int, game_map: GameMap) -> None:
+        """Keep a floor the player just left."""
+        self.discard(floor)
+        game_map.trim()
+        self.game_maps[floor] = game_map
+        while len(self.game_maps) > self.floors_in_memory:
+            from savefile import compress_floor, encode_floor
+
+            oldest_floor, oldest_map = self.game_maps.popitem(last=False)
+            snapshot = self.snapshots.pop(oldest_floor, None)
+            if snapshot is not None:
+                self.add_compressed(oldest_floor, compress_floor(snapshot))
+            else:
+                self.add_compressed(oldest_floor, encode_floor(oldest_map))
+
+    def add_compressed(self, floor: int, data: bytes) -> None:
+        self.compressed[floor] = data
+        self.compressed_bytes += len(data)
+        while self.compressed_bytes > self.max_compressed_bytes and self.compressed:
+            oldest_floor, oldest_data = self.compressed.popitem(last=False)
+            self.compressed_bytes -= len(oldest_data)
+            self.spill(oldest_floor, oldest_data)
+
+    def spill(self, floor: int, data: bytes) -> None:
+        if self.directory is None:
+            self.directory = tempfile.TemporaryDirectory(prefix="floors-")
+        filename = os.path.join(self.directory.name, f"{floor}.floor")
+        with open(filename, "wb") as f:
+            f.write(data)
+        self.spilled[floor] = filename
+
+    def get_compressed(self, floor: int) -> Optional[bytes]:
+        """Return a floor in the form `encode_floor` gives, wherever it's kept."""
+        if floor in self.game_maps:
+            from savefile import encode_floor
+
+            return encode_floor(self.game_maps[floor])
+        if floor in self.compressed:
+            return self.compressed[floor]
+        if floor in self.spilled:
+            with open(self.spilled[floor], "rb") as f:
+                return f.read()
+        return None
+
+    def take(self, floor: int, engine: Engine) -> Optional[GameMap]:
+        """Remove a floor from the cache and return it, None if it was never left."""
+        if floor in self.game_maps:
+            self.snapshots.pop(floor, None)
+            return self.game_maps.pop(floor)
+        data = self.get_compressed(floor)
+        if data is None:
+            return None
+        self.discard(floor)
+        from savefile import decode_floor
+
+        return decode_floor(data, engine)
+
+    def discard(self, floor: int) -> None:
+        self.game_maps.pop(floor, None)
+        self.snapshots.pop(floor, None)
+        data = self.compressed.pop(floor, None)
+        if data is not None:
+            self.compressed_bytes -= len(data)
+        filename = self.spilled.pop(floor, None)
+        if filename is not None:
+            os.remove(filename)
+
+    def export(self) -> Dict[int, bytes]:
+        """Return every floor in the form `encode_floor` gives, for save files.
+        Floors kept as they are come uncompressed, they are compressed along with the rest
+        of the save on the thread writing it instead of on the main thread.
+        """
+        from savefile import encode_floor
+
+        floors = {}
+        for floor in sorted((*self.game_maps, *self.compressed, *self.spilled)):
+            if floor in self.game_maps:
+                if floor not in self.snapshots:
+                    self.snapshots[floor] = encode_floor(self.game_maps[floor], "none")
+                floors[floor] = self.snapshots[floor]
+            else:
+                data = self.get_compressed(floor)
+                assert data is not None
+                floors[floor] = data
+        return floors
+
+    def restore(self, floors: Dict[int, bytes]) -> None:
+        """Take back floors from `export`, they stay compressed until visited."""
+        from savefile import compress_floor
+
+        for floor, data in floors.items():
+            self.discard(floor)
+            self.add_compressed(floor, compress_floor(data))
@@ -0,0 +1,62 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Tuple
+import numpy as np
+from tcod.map import compute_fov
+
+Window = Tuple[slice, slice]
+
+
+def get_fov_window(width: int, height: int, x: int, y: int, radius: int) -> Window:
+    """Return the part of the map a FOV of this radius can reach, the whole map if radius is 0."""
+    if radius <= 0:
+        return slice(0, width), slice(0, height)
+    return (
+        slice(max(x - radius, 0), min(x + radius + 1, width)),
+        slice(max(y - radius, 0), min(y + radius + 1, height)),
+    )
+
+
+class FovCache:
+    """The most recently used FOV masks of a map, keyed by (x, y, radius, tiles version).
+    Masks only cover the window the radius can reach, so entries stay small on large maps.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.masks: OrderedDict[Tuple[int, int, int, int], Tuple[Window, np.ndarray]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(
+        self, transparency: np.ndarray, x: int, y: int, radius: int, version: int
+    ) -> Tuple[Window, np.ndarray]:
+        """Return the window around (x, y) and the visible tiles inside it.
+        `version` must change whenever `transparency` does.
+        """
+        key = (x, y, radius, version)
+        entry = self.masks.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.masks.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        window = get_fov_window(*transparency.shape, x, y, radius)
+        x_window, y_window = window
+        mask = compute_fov(
+            transparency[window], (x - x_window.start, y - y_window.start), radius=radius
+        )
+        mask.flags.writeable = False #Shared by every lookup of this key
+        self.masks[key] = entry = window, mask
+        if len(self.masks) > self.capacity:
+            self.masks.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        self.masks.clear()
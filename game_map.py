@@ -1,35 +1,116 @@
 from __future__ import annotations
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import random
+import traceback
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
 import numpy as np
 from tcod.console import Console
+import tcod.path
+from actor_store import ActorStore
+from floor_cache import FloorCache
+from chunks import DEFAULT_CHUNK_SIZE, ChunkedArray, MapArray
+from fov_cache import FovCache, Window
 from entity import Actor, Item
 import tile_types
 
 if TYPE_CHECKING:
     from engine import Engine 
     from entity import Entity
+    from procgen import CaveGenerator, FloorPlan
+
+_NO_ENTITIES: AbstractSet[Entity] = frozenset()
+
+#Extra path cost of a tile holding a blocking entity
+BLOCKER_COST = 10
+
+#Seconds to wait for a floor the worker is still making before making it here instead
+PREGENERATION_WAIT = 1.0
+
+_floor_executor: Optional[ProcessPoolExecutor] = None
+
+def get_floor_executor() -> ProcessPoolExecutor:
+    """Return the worker process that generates floors ahead of the player."""
+    global _floor_executor
+    if _floor_executor is None:
+        #Spawned rather than forked, forking a process that runs threads isn't safe
+        _floor_executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _floor_executor
+
+def close_floor_executor() -> None:
+    global _floor_executor
+    if _floor_executor is not None:
+        _floor_executor.shutdown(wait=False, cancel_futures=True)
+        _floor_executor = None
 
 class GameMap:
     def __init__(
-        self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = ()
+        self,
+        engine: Engine,
+        width: int,
+        height: int,
+        entities: Iterable[Entity] = (),
+        tiles: Optional[np.ndarray] = None,
     ):
         self.engine = engine
         self.width, self.height = width, height
-        self.entities = set(entities)
-        self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
-        self.visible = np.full(
-            (width, height), fill_value=False, order="F"
-            ) #Tiles the player can currently see
-        self.explored = np.full(
-            (width, height), fill_value=False, order="F"
-            ) #Tiles the player has seen before
+        #Used as a set, a dict keeps the order entities were added in so runs can be replayed
+        self.entities: Dict[Entity, None] = {}
+        #Entities keyed by the tile they stand on, kept current by add/remove/move_entity.
+        #Each tile's entities are an ordered set like `entities`, so the first item picked up
+        #from a pile is the same every run.
+        self.entity_index: Dict[Tuple[int, int], Dict[Entity, None]] = {}
+        #Positions and health of the actors as numpy columns, for area effects
+        self.actor_store = ActorStore()
+        for entity in entities:
+            self.add_entity(entity)
+        if tiles is None:
+            tiles = tile_types.new_tile_grid(width, height, tile_types.wall)
+        self.tiles = tiles
+        self.visible = self.new_mask() #Tiles the player can currently see
+        self.explored = self.new_mask() #Tiles the player has seen before
         
         self.downstairs_location = (0, 0)
+        self.upstairs_location: Optional[Tuple[int, int]] = None #None on the first floor
+        
+        #The part of the map where actors take turns and paths are found, all of it here
+        self.active_window: Window = (slice(0, width), slice(0, height))
+        #Walking cost of each tile of the active window, built on first use and patched as blockers move
+        self.path_cost: Optional[np.ndarray] = None
+        #Distance map towards a single target, shared by every actor during a turn
+        self.flow_field: Optional[np.ndarray] = None
+        self.flow_field_target: Optional[Tuple[int, int]] = None
+        self.flow_field_origin = (0, 0) #The map position of index (0, 0) in the flow field
+        
+        #What render draws, rebuilt only after the tiles, FOV or entities change
+        self.tile_graphics: Optional[Tuple[np.ndarray, np.ndarray]] = None #Dark, light
+        self.graphics: Optional[np.ndarray] = None
+        self.graphics_window: Optional[Window] = None
+        self.visible_entities: Optional[List[Entity]] = None
+        
+        #Bumped by invalidate_tiles, so FOV masks of older tiles aren't reused
+        self.tiles_version = 0
+        self.fov_cache = FovCache()
+        #The FOV last applied to `visible` and the window holding it, None if unknown
+        self.fov_key: Optional[Tuple[int, int, int, int]] = None
+        self.fov_window: Optional[Window] = None
+    
+    def new_mask(self) -> MapArray:
+        return np.full((self.width, self.height), fill_value=False, order="F")
     
     @property
     def gamemap(self) -> GameMap:
         return self
     
+    @property
+    def active_origin(self) -> Tuple[int, int]:
+        """The map position of index (0, 0) in the path cost and flow field arrays."""
+        x_window, y_window = self.active_window
+        return x_window.start, y_window.start
+    
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this maps living actors."""
@@ -42,57 +123,347 @@ class GameMap:
     @property
     def items(self) -> Iterator[Item]:
         yield from (entity for entity in self.entities if isinstance(entity, Item))
+    
+    def get_active_actors(self) -> List[Actor]:
+        """Return the living actors that take turns, those in the active window."""
+        return list(self.actors)
+    
+    def update_active_window(self, x: int, y: int) -> None:
+        """Follow the player to (x, y), the whole map is always active here."""
+        
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map at its current location."""
+        self.entities[entity] = None
+        self.entity_index.setdefault((entity.x, entity.y), {})[entity] = None
+        if isinstance(entity, Actor):
+            self.actor_store.add(entity)
+        if entity.blocks_movement:
+            self.add_blocker_cost(entity.x, entity.y, BLOCKER_COST)
+        self.visible_entities = None
+        
+    def remove_entity(self, entity: Entity) -> None:
+        """Remove an entity from this map."""
+        del self.entities[entity]
+        location = (entity.x, entity.y)
+        entities_here = self.entity_index[location]
+        entities_here.pop(entity, None)
+        if not entities_here:
+            del self.entity_index[location]
+        if isinstance(entity, Actor):
+            self.actor_store.remove(entity)
+        if entity.blocks_movement:
+            self.add_blocker_cost(entity.x, entity.y, -BLOCKER_COST)
+        self.visible_entities = None
+    
+    def move_entity(self, entity: Entity, x: int, y: int) -> None:
+        """Move an entity already on this map to a new location."""
+        location = (entity.x, entity.y)
+        entities_here = self.entity_index[location]
+        entities_here.pop(entity, None)
+        if not entities_here:
+            del self.entity_index[location]
+        if entity.blocks_movement:
+            self.add_blocker_cost(entity.x, entity.y, -BLOCKER_COST)
+            self.add_blocker_cost(x, y, BLOCKER_COST)
+        entity.x, entity.y = x, y
+        self.entity_index.setdefault((x, y), {})[entity] = None
+        if isinstance(entity, Actor):
+            self.actor_store.move(entity, x, y)
+        self.visible_entities = None
+    
+    def set_blocks_movement(self, entity: Entity, blocks_movement: bool) -> None:
+        """Change whether an entity on this map blocks movement."""
+        if entity.blocks_movement != blocks_movement:
+            self.add_blocker_cost(
+                entity.x, entity.y, BLOCKER_COST if blocks_movement else -BLOCKER_COST
+            )
+        entity.blocks_movement = blocks_movement
+        self.visible_entities = None #Corpses are drawn below the living
+    
+    def invalidate_tiles(self) -> None:
+        """Call after modifying `tiles`, drops everything derived from them."""
+        self.path_cost = None
+        self.clear_flow_field()
+        self.tile_graphics = None
+        self.graphics = None
+        self.tiles_version += 1
+    
+    def invalidate_fov(self) -> None:
+        """Call after modifying `visible` or `explored`."""
+        self.graphics = None
+        self.visible_entities = None
+        self.fov_key = None
+        self.fov_window = None
+        
+    def trim(self) -> None:
+        """Drop everything rebuilt on demand, for a map the player has left.
+        Nothing is visible on a floor without the player, which is also how compressed
+        and saved floors come back, so enemies act the same whichever way it was kept.
+        """
+        self.visible[...] = False
+        self.invalidate_tiles()
+        self.invalidate_fov()
+        self.fov_cache.clear()
+        
+    def get_entities_at_location(self, x: int, y: int) -> AbstractSet[Entity]:
+        """Return the entities standing on this tile."""
+        entities_here = self.entity_index.get((x, y))
+        return entities_here.keys() if entities_here is not None else _NO_ENTITIES
         
     def get_blocking_entity_at_location(
         self, location_x: int, location_y: int
         ) -> Optional[Entity]:
-        for entity in self.entities:
-            if (
-                entity.blocks_movement
-                and entity.x == location_x 
-                and entity.y == location_y
-                ):
+        for entity in self.get_entities_at_location(location_x, location_y):
+            if entity.blocks_movement:
                 return entity
         return None
     
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self.get_entities_at_location(x, y):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
         return None    
          
+    def get_path_cost(self) -> np.ndarray:
+        """Return the cost of walking onto each tile, zero where a tile can't be entered.
+        The array is shared and kept current by this map, callers must not modify it.
+        """
+        if self.path_cost is None:
+            #Copy the walkable array.
+            cost = np.array(self.tiles["walkable"][self.active_window], dtype=np.int8)
+            self.path_cost = cost
+            
+            for entity in self.entities:
+                if entity.blocks_movement:
+                    self.add_blocker_cost(entity.x, entity.y, BLOCKER_COST)
+        return self.path_cost
+    
+    def add_blocker_cost(self, x: int, y: int, amount: int) -> None:
+        """Adjust the cost of a tile as a blocking entity arrives or leaves."""
+        if self.path_cost is None:
+            return
+        origin_x, origin_y = self.active_origin
+        x, y = x - origin_x, y - origin_y
+        width, height = self.path_cost.shape
+        # Check that the tile is in the grid and the cost isn't zero(blocking).
+        if 0 <= x < width and 0 <= y < height and self.path_cost[x, y]:
+            """ Add to the cost of a blocked position.
+             A lower number means more enemies will crowed behind each other
+             in hallways. A higher number means enemies will take longer in paths
+             in order to surround the player. 
+             """
+            self.path_cost[x, y] += amount
+    
+    def get_flow_window(self, x: int, y: int) -> Window:
+        """Return the part of the active window a flow field towards (x, y) covers, all of it here."""
+        return self.active_window
+    
+    def get_flow_field(self, x: int, y: int) -> np.ndarray:
+        """Return the walking distance to (x, y) from every tile of its flow window,
+        the map position of index (0, 0) is `flow_field_origin`.
+        The result is cached until `clear_flow_field` is called, so every actor heading
+        to the same target in a turn shares one Dijkstra pass.
+        """
+        if self.flow_field is None or self.flow_field_target != (x, y):
+            active_x, active_y = self.active_origin
+            x_window, y_window = self.get_flow_window(x, y)
+            cost = self.get_path_cost()[
+                x_window.start - active_x : x_window.stop - active_x,
+                y_window.start - active_y : y_window.stop - active_y,
+            ]
+            distance = np.full(cost.shape, np.iinfo(np.int32).max, dtype=np.int32, order="F")
+            origin_x, origin_y = x_window.start, y_window.start
+            if 0 <= x - origin_x < cost.shape[0] and 0 <= y - origin_y < cost.shape[1]:
+                distance[x - origin_x, y - origin_y] = 0
+                tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3, out=distance)
+            self.flow_field_origin = origin_x, origin_y
+            self.flow_field = distance
+            self.flow_field_target = (x, y)
+        return self.flow_field
+    
+    def clear_flow_field(self) -> None:
+        """Drop the cached flow field, it is rebuilt on the next request."""
+        self.flow_field = None
+        self.flow_field_target = None
+         
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
         return 0 <= x < self.width and 0 <= y < self.height
     
-    def render(self, console:Console) -> None:
+    def get_tile_graphics(self, window: Window) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the dark and light graphics of the tiles in a window, as raw console bytes."""
+        if self.tile_graphics is None:
+            self.tile_graphics = (
+                self.tiles["dark"].astype(tile_types.console_graphic_dt, order="F")
+                .view(tile_types.console_graphic_raw_dt),
+                self.tiles["light"].astype(tile_types.console_graphic_dt, order="F")
+                .view(tile_types.console_graphic_raw_dt),
+            )
+        dark, light = self.tile_graphics
+        return dark[window], light[window]
+    
+    def get_graphics(self, window: Optional[Window] = None) -> np.ndarray:
         """
-        Renders the map.
+        Return a window of the map as the player sees it, the whole map by default,
+        in the layout of Console.rgb viewed as raw bytes.
         
         If a tiles is in the "visible" array, then draw it with the colors of "light".
         If not, but is in explored array, then draw with "dark" colors.
         Otherwise use SHROUD
         
+        The result is cached until invalidate_tiles or invalidate_fov is called,
+        or another window is asked for.
         """
-        console.rgb[0 : self.width, 0 : self.height] = np.select(
-            condlist=[self.visible, self.explored],
-            choicelist=[self.tiles["light"], self.tiles["dark"]],
-            default=tile_types.SHROUD
-        )
-        
-        entities_sorted_for_rendering = sorted(
-            self.entities, key=lambda x: x.render_order.value
-        )
+        if window is None:
+            window = (slice(0, self.width), slice(0, self.height))
+        if self.graphics is None or self.graphics_window != window:
+            dark, light = self.get_tile_graphics(window)
+            shroud = tile_types.SHROUD.astype(tile_types.console_graphic_dt)
+            graphics = np.full(
+                dark.shape,
+                fill_value=shroud.view(tile_types.console_graphic_raw_dt),
+                order="F",
+            )
+            np.copyto(graphics, dark, where=self.explored[window])
+            np.copyto(graphics, light, where=self.visible[window])
+            self.graphics = graphics
+            self.graphics_window = window
+        return self.graphics
+    
+    def get_visible_entities(self) -> List[Entity]:
+        """Return the entities in the FOV in drawing order, cached like get_graphics."""
+        if self.visible_entities is None:
+            if self.fov_window is None:
+                visible = self.visible
+                in_fov = (entity for entity in self.entities if visible[entity.x, entity.y])
+            else:
+                #Nothing outside the window of the last FOV is visible
+                x_window, y_window = self.fov_window
+                window_visible = self.visible[self.fov_window]
+                in_fov = (
+                    entity for entity in self.entities
+                    if x_window.start <= entity.x < x_window.stop
+                    and y_window.start <= entity.y < y_window.stop
+                    and window_visible[entity.x - x_window.start, entity.y - y_window.start]
+                )
+            self.visible_entities = sorted(in_fov, key=lambda x: x.render_order.value)
+        return self.visible_entities
+    
+    def render(self, console:Console, window: Optional[Window] = None) -> None:
+        """Renders a window of the map from the console's top left, the whole map by default.
+        Only the window is composed and only entities inside it are drawn, so the cost
+        follows the size of the window rather than the map.
+        """
+        if window is None:
+            window = (slice(0, self.width), slice(0, self.height))
+        graphics = self.get_graphics(window)
+        rgb = console.rgb[0 : graphics.shape[0], 0 : graphics.shape[1]]
+        if rgb.dtype == tile_types.console_graphic_dt and rgb.strides[0] == rgb.itemsize:
+            rgb.T.view(tile_types.console_graphic_raw_dt)[...] = graphics.T
+        else:
+            rgb[...] = graphics.view(tile_types.console_graphic_dt)
         
-        for entity in entities_sorted_for_rendering:
-            #Only print entities that are in the FOV
-            if self.visible[entity.x, entity.y]:
+        x_window, y_window = window
+        for entity in self.get_visible_entities():
+            if x_window.start <= entity.x < x_window.stop and y_window.start <= entity.y < y_window.stop:
                 console.print(
-                    x=entity.x, y=entity.y, string=entity.char, fg=entity.color
+                    x=entity.x - x_window.start, y=entity.y - y_window.start,
+                    string=entity.char, fg=entity.color,
                     )
         
+class ChunkedGameMap(GameMap):
+    """A map kept in square chunks which are only generated once the player comes near,
+    for floors far larger than the screen. Memory follows the explored area rather than
+    the size of the map: chunks of tiles are made by `generator` and FOV masks only
+    allocate the chunks they touch.
+    
+    The active window covers the chunks within `active_radius` chunks of the player.
+    Only actors inside it take turns and pathfinding doesn't look beyond it, the flow field
+    the player is chased on only reaches `flow_radius` tiles from them.
+    """
+    
+    def __init__(
+        self,
+        engine: Engine,
+        width: int,
+        height: int,
+        generator: Optional[CaveGenerator],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        active_radius: int = 2,
+        flow_radius: int = 32,
+    ):
+        self.chunk_size = chunk_size
+        super().__init__(
+            engine,
+            width,
+            height,
+            tiles=ChunkedArray((width, height), tile_types.tile_dt, tile_types.wall, chunk_size),
+        )
+        self.generator = generator
+        self.active_radius = active_radius
+        self.flow_radius = flow_radius
+        #Chunks made by the generator, their entities were spawned along with them
+        self.generated: Set[Tuple[int, int]] = set()
+        self.active_window = self.get_active_window(0, 0)
+    
+    def new_mask(self) -> MapArray:
+        return ChunkedArray((self.width, self.height), bool, False, self.chunk_size)
+    
+    def get_active_window(self, x: int, y: int) -> Window:
+        """Return the window of whole chunks within `active_radius` chunks of (x, y)."""
+        size = self.chunk_size
+        chunk_x, chunk_y = x // size, y // size
+        return (
+            slice(max(chunk_x - self.active_radius, 0) * size, min((chunk_x + self.active_radius + 1) * size, self.width)),
+            slice(max(chunk_y - self.active_radius, 0) * size, min((chunk_y + self.active_radius + 1) * size, self.height)),
+        )
+    
+    def update_active_window(self, x: int, y: int) -> None:
+        """Generate the chunks around (x, y) and make them the active window."""
+        window = self.get_active_window(x, y)
+        new_chunks = [key for key in self.tiles.get_chunk_keys(window) if key not in self.generated]
+        if new_chunks and self.generator is not None:
+            for key in new_chunks:
+                self.generator.generate_chunk(self, key)
+                self.generated.add(key)
+            self.invalidate_tiles()
+        if window != self.active_window:
+            self.active_window = window
+            self.path_cost = None
+            self.clear_flow_field()
+    
+    def get_flow_window(self, x: int, y: int) -> Window:
+        """Return the tiles within `flow_radius` of (x, y), enough to chase the player around
+        obstacles from anywhere the player can be seen.
+        """
+        x_window, y_window = self.active_window
+        return (
+            slice(max(x - self.flow_radius, x_window.start), min(x + self.flow_radius + 1, x_window.stop)),
+            slice(max(y - self.flow_radius, y_window.start), min(y + self.flow_radius + 1, y_window.stop)),
+        )
+    
+    def get_active_actors(self) -> List[Actor]:
+        store = self.actor_store
+        x_window, y_window = self.active_window
+        inside = np.flatnonzero(
+            store.alive
+            & (store.x >= x_window.start) & (store.x < x_window.stop)
+            & (store.y >= y_window.start) & (store.y < y_window.stop)
+        )
+        return store.get_actors(inside) #In slot order, which a replay reproduces
+    
+    def get_tile_graphics(self, window: Window) -> Tuple[np.ndarray, np.ndarray]:
+        tiles = self.tiles[window]
+        return (
+            tiles["dark"].astype(tile_types.console_graphic_dt, order="F")
+            .view(tile_types.console_graphic_raw_dt),
+            tiles["light"].astype(tile_types.console_graphic_dt, order="F")
+            .view(tile_types.console_graphic_raw_dt),
+        )
+    
 class GameWorld:
     #Holds the settings for the GameMap, generates new maps when moving down stairs
+    #and keeps the floors left behind for when the player comes back up
     
     def __init__(
         self,
@@ -104,6 +475,8 @@ class GameWorld:
         room_min_size: int,
         room_max_size: int,
         current_floor: int = 0,
+        seed: Optional[int] = None,
+        caves: bool = False,
     ): 
         self.engine = engine
         self.map_width = map_width
@@ -112,16 +485,122 @@ class GameWorld:
         self.room_min_size = room_min_size
         self.room_max_size = room_max_size
         self.current_floor = current_floor
+        #Caves are chunked maps made as they're explored, for floors far larger than the screen
+        self.caves = caves
+        #Every random choice in a run derives from this, floors are reproduced from it
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        #Random choices made while playing the current floor
+        self.rng = self.get_rng("turns", current_floor)
+        #Floors the player has left, by floor number
+        self.floor_cache = FloorCache()
+        
+        self.pregenerate = False
+        #The plan of the next floor being made in a worker process, with its floor number
+        self.next_floor: Optional[Tuple[int, Future[FloorPlan]]] = None
     
-    def generate_floor(self) -> None:
-        from procgen import generate_dungeon
+    def get_rng(self, stream: str, floor: int) -> random.Random:
+        """Return a new random stream for one use on one floor, the same every time for this seed."""
+        return random.Random(f"{self.seed}:{stream}:{floor}")
+    
+    def enable_pregeneration(self) -> None:
+        """Generate each next floor in a worker process while the player explores this one.
+        Caves are made a chunk at a time as they're explored, so there's nothing to do ahead.
+        """
+        self.pregenerate = not self.caves
+        if self.pregenerate:
+            self.pregenerate_floor()
+    
+    def pregenerate_floor(self) -> None:
+        from procgen import generate_floor_plan
         
-        self.current_floor += 1
-        self.engine.game_map = generate_dungeon(
+        floor_number = self.current_floor + 1
+        if self.next_floor is not None:
+            self.next_floor[1].cancel() #Made for a floor the player went past
+        future = get_floor_executor().submit(
+            generate_floor_plan,
             max_rooms = self.max_rooms,
             room_min_size = self.room_min_size,
             room_max_size = self.room_max_size,
             map_width = self.map_width,
             map_height = self.map_height,
-            engine = self.engine,   
+            floor_number = floor_number,
+            rng = self.get_rng("procgen", floor_number),
         )
+        self.next_floor = floor_number, future
+    
+    def take_pregenerated_floor(self) -> Optional[FloorPlan]:
+        """Return the plan made for the current floor, or None if it has to be made here.
+        A plan the worker is still making is waited on for up to PREGENERATION_WAIT seconds,
+        it's usually nearly done and making it again here would take longer.
+        """
+        if self.next_floor is None:
+            return None
+        floor_number, future = self.next_floor
+        self.next_floor = None
+        if floor_number != self.current_floor:
+            future.cancel() #So it doesn't hold up the next floor, if it hasn't started yet
+            return None
+        if future.cancel():
+            return None #Never started
+        try:
+            return future.result(timeout=PREGENERATION_WAIT)
+        except FutureTimeoutError:
+            return None #Left to finish, its result is dropped
+        except BrokenProcessPool: #The worker died, start a new one next time
+            traceback.print_exc()
+            close_floor_executor()
+        except Exception: #Generate the floor here instead
+            traceback.print_exc()
+        return None
+    
+    def generate_floor(self) -> None:
+        """Move the player down to the next floor, generating it on the first visit."""
+        self.change_floor(self.current_floor + 1)
+    
+    def ascend(self) -> None:
+        """Move the player back up to the floor above."""
+        self.change_floor(self.current_floor - 1)
+    
+    def change_floor(self, floor: int) -> None:
+        """Move the player to another floor, arriving on the stairs that lead back.
+        Floors the player left are taken from the floor cache, others are generated.
+        A floor missing from the cache, like one above the floor a game was started on,
+        is generated again from the seed.
+        """
+        from procgen import build_game_map, generate_cave_map, generate_floor_plan
+        
+        descending = floor > self.current_floor
+        old_floor, old_map = self.current_floor, getattr(self.engine, "game_map", None)
+        self.current_floor = floor
+        
+        game_map = self.floor_cache.take(floor, self.engine)
+        if game_map is None and self.caves:
+            game_map = generate_cave_map(
+                self.map_width, self.map_height, floor, self.seed, self.engine
+            )
+        elif game_map is None:
+            floor_plan = self.take_pregenerated_floor()
+            if floor_plan is None:
+                floor_plan = generate_floor_plan(
+                    max_rooms = self.max_rooms,
+                    room_min_size = self.room_min_size,
+                    room_max_size = self.room_max_size,
+                    map_width = self.map_width,
+                    map_height = self.map_height,
+                    floor_number = floor,
+                    rng = self.get_rng("procgen", floor),
+                )
+            game_map = build_game_map(floor_plan, self.engine)
+        
+        arrival = game_map.upstairs_location if descending else game_map.downstairs_location
+        if arrival is not None:
+            self.engine.player.place(*arrival, game_map)
+        game_map.update_active_window(self.engine.player.x, self.engine.player.y)
+        if old_map is not None:
+            self.floor_cache.put(old_floor, old_map)
+        
+        self.rng = self.get_rng("turns", floor)
+        self.engine.game_map = game_map
+        if self.pregenerate and floor + 1 not in self.floor_cache:
+            if self.next_floor is None or self.next_floor[0] != floor + 1:
+                self.pregenerate_floor()
@@ -0,0 +1,123 @@
+#Drive the game without a window, for simulations, CI benchmarks and profiling
+from __future__ import annotations
+import argparse
+import time
+from typing import Optional
+import tcod
+from actions import (
+    Action,
+    BumpAction,
+    MeleeAction,
+    TakeStairsAction,
+    WaitAction,
+)
+from engine import Engine
+import input_handlers
+from perf import timings
+import setup_game
+
+
+class HeadlessGame:
+    """A game session that never opens a window.
+    Actions are performed programmatically and, if a console size is given,
+    each frame can be rendered into an off-screen console.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        *,
+        seed: Optional[int] = None,
+        console_width: int = 80,
+        console_height: int = 50,
+        render: bool = False,
+    ):
+        self.engine = engine if engine is not None else setup_game.new_game(seed=seed)
+        self.handler: input_handlers.BaseEventHandler = input_handlers.MainGameEventHandler(
+            self.engine
+        )
+        self.console: Optional[tcod.console.Console] = None
+        if render:
+            self.console = tcod.console.Console(console_width, console_height, order="F")
+        self.turns = 0
+
+    def perform(self, action: Action) -> bool:
+        """Perform an action for the player, then let the enemies take their turn.
+        Returns True if the action advanced a turn.
+        """
+        if not input_handlers.EventHandler(self.engine).handle_action(action):
+            return False
+        self.turns += 1
+        return True
+
+    def handle_event(self, event: tcod.event.Event) -> None:
+        """Send a synthetic input event to the active handler, as the window would."""
+        self.handler = self.handler.handle_events(event)
+
+    def render(self) -> Optional[tcod.console.Console]:
+        """Draw the active handler into the off-screen console, if there is one."""
+        if self.console is None:
+            return None
+        self.console.clear()
+        self.handler.on_render(console=self.console)
+        return self.console
+
+
+def autoplay_action(engine: Engine) -> Action:
+    """Return a simple scripted move: fight adjacent enemies, otherwise head for the stairs."""
+    player = engine.player
+    game_map = engine.game_map
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if (dx or dy) and game_map.get_actor_at_location(player.x + dx, player.y + dy):
+                return MeleeAction(player, dx, dy)
+
+    if (player.x, player.y) == game_map.downstairs_location:
+        return TakeStairsAction(player)
+
+    path = player.ai.get_path_to(*game_map.downstairs_location)
+    if path:
+        dest_x, dest_y = path[0]
+        return BumpAction(player, dest_x - player.x, dest_y - player.y)
+    return WaitAction(player)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play the game without a window.")
+    parser.add_argument("--turns", type=int, default=1000, help="Number of turns to simulate.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the run.")
+    parser.add_argument("--render", action="store_true", help="Render every turn off-screen.")
+    parser.add_argument(
+        "--pregenerate", action="store_true", help="Generate floors ahead in a worker process."
+    )
+    parser.add_argument(
+        "--perf-trace",
+        default=None,
+        help="Write the phase timings of every turn and frame to this file, CSV if it ends in .csv else JSONL.",
+    )
+    args = parser.parse_args()
+    if args.perf_trace:
+        timings.open_trace(args.perf_trace)
+
+    game = HeadlessGame(seed=args.seed, render=args.render)
+    if args.pregenerate:
+        game.engine.game_world.enable_pregeneration()
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        if not game.engine.player.is_alive:
+            break
+        if not game.perform(autoplay_action(game.engine)):
+            game.perform(WaitAction(game.engine.player))
+        game.render()
+        timings.end_frame()
+    elapsed = time.perf_counter() - start
+    timings.close_trace()
+
+    print(
+        f"{game.turns} turns in {elapsed:.2f}s, reached floor {game.engine.game_world.current_floor}"
+        f" with {game.engine.player.fighter.hp} HP"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import os
 from typing import Callable, Optional, Tuple, TYPE_CHECKING, Union
 from tcod import libtcodpy
 import tcod.event
@@ -12,6 +11,8 @@ from actions import (
 )
 import color
 import exceptions
+from message_log import LineIndex
+from perf import timings
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -124,19 +125,28 @@ class EventHandler(BaseEventHandler):
             return False
         
         try:
-            action.perform()
+            with timings.phase("action.perform"):
+                action.perform()
         except exceptions.Impossible as exc:
             self.engine.message_log.add_message(exc.args[0], color.impossible)
             return False #Skip enemy turn on exceptions.
         
-        self.engine.handle_enemy_turns()
+        with timings.phase("handle_enemy_turns"):
+            self.engine.handle_enemy_turns()
         
-        self.engine.update_fov()
+        with timings.phase("update_fov"):
+            self.engine.update_fov()
+        
+        if self.engine.autosaver:
+            self.engine.autosaver.end_turn(self.engine)
+        timings.end_turn()
         return True        
     
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
-        if self.engine.game_map.in_bounds(event.tile.x, event.tile.y):
-            self.engine.mouse_location = event.tile.x, event.tile.y
+        camera = self.engine.camera
+        x, y = camera.screen_to_map(*event.integer_position)
+        if camera.is_on_screen(x, y) and self.engine.game_map.in_bounds(x, y):
+            self.engine.mouse_location = x, y
     
     def ev_quit(self, event: tcod.event.Quit) -> Optional[Action]:
         #Quit event when we click "X" window of the program
@@ -178,7 +188,7 @@ class CharacterScreenEventHandler(AskUserEventHandler):
     def on_render(self, console: tcod.Console) -> None:
         super().on_render(console)
         
-        if self.engine.player.x <= 30:
+        if self.engine.camera.map_to_screen(self.engine.player.x, self.engine.player.y)[0] <= 30:
             x = 40
         else:
             x = 0
@@ -223,7 +233,7 @@ class LevelUpEventHandler(AskUserEventHandler):
     def on_render(self, console: tcod.Console) -> None:
         super().on_render(console)
         
-        if self.engine.player.x <= 30:
+        if self.engine.camera.map_to_screen(self.engine.player.x, self.engine.player.y)[0] <= 30:
             x = 40
         else:
             x = 0
@@ -300,7 +310,7 @@ class InventoryEventHandler(AskUserEventHandler):
         if height <= 3:
             height = 3
             
-        if self.engine.player.x <= 30:
+        if self.engine.camera.map_to_screen(self.engine.player.x, self.engine.player.y)[0] <= 30:
             x = 40
         else:
             x = 0
@@ -387,9 +397,11 @@ class SelectIndexHandler(AskUserEventHandler):
     def on_render(self, console: tcod.Console) -> None:
         """Highlight the tile under the cursor"""
         super().on_render(console)
-        x, y = self.engine.mouse_location
-        console.rgb["bg"][x, y] = color.white
-        console.rgb["fg"][x, y] = color.black
+        camera = self.engine.camera
+        if camera.is_on_screen(*self.engine.mouse_location):
+            x, y = camera.map_to_screen(*self.engine.mouse_location)
+            console.rgb["bg"][x, y] = color.white
+            console.rgb["fg"][x, y] = color.black
         
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[ActionOrHandler]:
         """Check for key movement or confirmation keys"""
@@ -408,9 +420,10 @@ class SelectIndexHandler(AskUserEventHandler):
             dx, dy = MOVEMENT_KEYS[key]
             x += dx * modifier
             y += dy * modifier
-            #Clamp cursor index to map size
-            x = max(0, min(x, self.engine.game_map.width - 1))
-            y = max(0, min(y, self.engine.game_map - 1))
+            #Clamp cursor index to the part of the map on screen
+            x_window, y_window = self.engine.camera.window
+            x = max(x_window.start, min(x, x_window.stop - 1))
+            y = max(y_window.start, min(y, y_window.stop - 1))
             self.engine.mouse_location = x, y
             return None
         elif key in CONFIRM_KEYS:
@@ -419,9 +432,11 @@ class SelectIndexHandler(AskUserEventHandler):
                         
     def ev_mousebuttondown(self, event: tcod.event.MouseButtonDown) -> Optional[ActionOrHandler]:
         """Left click confirms a selection."""
-        if self.engine.game_map.in_bounds(*event.tile):
+        camera = self.engine.camera
+        x, y = camera.screen_to_map(*event.integer_position)
+        if camera.is_on_screen(x, y) and self.engine.game_map.in_bounds(x, y):
             if event.button == 1:
-                return self.on_index_selected(*event.tile)
+                return self.on_index_selected(x, y)
         return super().ev_mousebuttondown(event)
     
     def on_index_selected(self, x: int, y: int) -> Optional[ActionOrHandler]:
@@ -462,7 +477,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
         #Highlight the tile under the cursor
         super().on_render(console)
         
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.map_to_screen(*self.engine.mouse_location)
         
         #Draw a rectangle around the targeted area, player can see affected tiles
         console.draw_frame(
@@ -485,7 +500,8 @@ class MainGameEventHandler(EventHandler):
         modifier = event.mod
         player = self.engine.player
         
-        if key == tcod.event.KeySym.PERIOD and modifier & (
+        #'>' and '<' both take the stairs the player stands on
+        if key in (tcod.event.KeySym.PERIOD, tcod.event.KeySym.COMMA) and modifier & (
             tcod.event.KMOD_LSHIFT | tcod.event.KMOD_RSHIFT
         ):
             return actions.TakeStairsAction(player)
@@ -528,8 +544,13 @@ class MainGameEventHandler(EventHandler):
 class GameOverEventHandler(EventHandler):
     def on_quit(self) -> None:
         #Handle exiting out of a finished game
-        if os.path.exists("savegame.sav"):
-            os.remove("savegame.sav") #Deletes the active save file
+        import savefile
+
+        if self.engine.autosaver:
+            self.engine.autosaver.close() #Don't let a late autosave recreate the file
+        if self.engine.message_log.journal is not None:
+            self.engine.message_log.journal.close()
+        savefile.delete("savegame.sav") #Deletes the active save file and its journal
         raise exceptions.QuitWithoutSaving() #Avoid saving a finished game
     
     def ev_quit(self, event: tcod.event.Quit) -> None:
@@ -552,29 +573,39 @@ class HistoryViewer(EventHandler):
     
     def __init__(self, engine: Engine):
         super().__init__(engine)
-        self.log_length = len(engine.message_log.messages)
+        #Includes the journal, older messages are read from disk as they're scrolled to
+        self.history = engine.message_log.history
+        self.log_length = len(self.history)
         self.cursor = self.log_length - 1
+        #Made on the first render, then kept and only redrawn when the cursor moves
+        self.log_console: Optional[tcod.console.Console] = None
+        self.line_index: Optional[LineIndex] = None
+        self.rendered_cursor: Optional[int] = None
         
     def on_render(self, console: tcod.console.Console) -> None:
         super().on_render(console) #Draw the main state as background
         
-        log_console = tcod.console.Console(console.width - 6, console.height - 6)
-        
-        #Draw a frame with a custom banner title.
-        log_console.draw_frame(0, 0, log_console.width, log_console.height)
-        log_console.print_box(
-            0, 0, log_console.width, 1, "|Game Log|", alignment=libtcodpy.CENTER
-        )
-        
-        #Render the message log using the cursor parameter
-        self.engine.message_log.render_messages(
-            log_console,
-            1,
-            1,
-            log_console.width - 2,
-            log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
-        )
+        width, height = console.width - 6, console.height - 6
+        log_console = self.log_console
+        if log_console is None or (log_console.width, log_console.height) != (width, height):
+            log_console = self.log_console = tcod.console.Console(width, height)
+            #Draw a frame with a custom banner title.
+            log_console.draw_frame(0, 0, log_console.width, log_console.height)
+            log_console.print_box(
+                0, 0, log_console.width, 1, "|Game Log|", alignment=libtcodpy.CENTER
+            )
+            self.line_index = LineIndex(self.history, log_console.width - 2)
+            self.rendered_cursor = None
+        
+        if self.cursor != self.rendered_cursor:
+            assert self.line_index is not None
+            #Render the message log using the cursor parameter, only the lines that fit are read
+            log_console.draw_rect(
+                1, 1, log_console.width - 2, log_console.height - 2, ord(" "), color.white, (0, 0, 0)
+            )
+            if self.log_length:
+                self.line_index.render(log_console, 1, 1, log_console.height - 2, self.cursor)
+            self.rendered_cursor = self.cursor
         log_console.blit(console, 3, 3)
         
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[MainGameEventHandler]:
@@ -0,0 +1,126 @@
+#Append-only files holding the messages that no longer fit in a MessageLog.
+#A journal is two files:
+#    data:  records of text length (I), count (I), color (BBB), then the UTF-8 text
+#    index: the offset of each record in the data file (Q), so any record is one lookup away
+#Records are appended as messages leave the log and are read back through mmap, so only
+#the messages being looked at are ever in memory.
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+import mmap
+import os
+import shutil
+import struct
+import sys
+from typing import Optional
+from message_log import Message
+
+RECORD = struct.Struct("<IIBBB")
+OFFSET = struct.Struct("<Q")
+
+
+class MessageJournal:
+    """The messages in the journal at `filename`, oldest first.
+    When `length` is given, records after the first `length` are removed, which rolls the
+    journal back to what a save file knew about. Records cut short by a crash are removed too.
+    """
+
+    def __init__(self, filename: str, length: Optional[int] = None, cache_size: int = 256):
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self.data_file = open(filename, "ab+")
+        self.index_file = open(self.index_filename, "ab+")
+        self.map: Optional[mmap.mmap] = None
+        #Recently read messages, so wrapped lines are kept while the history is scrolled
+        self.cache: OrderedDict[int, Message] = OrderedDict()
+        self.cache_size = cache_size
+
+        self.index_file.seek(0)
+        data = self.index_file.read()
+        self.offsets = array("Q")
+        self.offsets.frombytes(data[: len(data) // OFFSET.size * OFFSET.size])
+        if sys.byteorder == "big":
+            self.offsets.byteswap() #The index is little endian like the records
+        self.size = self.data_file.seek(0, os.SEEK_END)
+        keep = len(self.offsets) if length is None else min(length, len(self.offsets))
+        while keep and self.get_record_end(keep - 1) > self.size:
+            keep -= 1
+        self.truncate(keep)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def get_record_end(self, index: int) -> int:
+        offset = self.offsets[index]
+        if offset + RECORD.size > self.size:
+            return offset + RECORD.size
+        self.data_file.seek(offset)
+        text_length = RECORD.unpack(self.data_file.read(RECORD.size))[0]
+        return offset + RECORD.size + text_length
+
+    def truncate(self, length: int) -> None:
+        """Remove every record after the first `length`."""
+        self.flush()
+        self.close_map()
+        self.size = self.get_record_end(length - 1) if length else 0
+        del self.offsets[length:]
+        self.data_file.truncate(self.size)
+        self.index_file.truncate(length * OFFSET.size)
+        self.cache.clear()
+
+    def append(self, message: Message) -> None:
+        text = message.plain_text.encode("utf-8")
+        self.data_file.write(RECORD.pack(len(text), message.count, *message.fg) + text)
+        self.index_file.write(OFFSET.pack(self.size))
+        self.offsets.append(self.size)
+        self.size += RECORD.size + len(text)
+
+    def __getitem__(self, index: int) -> Message:
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(f"Journal index {index} out of range")
+        message = self.cache.get(index)
+        if message is not None:
+            self.cache.move_to_end(index)
+            return message
+
+        if self.map is None or len(self.map) < self.size:
+            #Map again to take in the records appended since the last read
+            self.flush()
+            self.close_map()
+            self.map = mmap.mmap(self.data_file.fileno(), self.size, access=mmap.ACCESS_READ)
+        offset = self.offsets[index]
+        text_length, count, r, g, b = RECORD.unpack_from(self.map, offset)
+        start = offset + RECORD.size
+        message = Message(self.map[start : start + text_length].decode("utf-8"), (r, g, b))
+        message.count = count
+
+        self.cache[index] = message
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return message
+
+    def flush(self) -> None:
+        """Write out the appended records, saves do this before recording the length."""
+        self.data_file.flush()
+        self.index_file.flush()
+
+    def copy_to(self, filename: str) -> None:
+        """Copy this journal to `filename`, for saves written somewhere else."""
+        if os.path.abspath(filename) == os.path.abspath(self.filename):
+            return
+        self.flush()
+        shutil.copyfile(self.filename, filename)
+        shutil.copyfile(self.index_filename, filename + ".idx")
+
+    def close_map(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self) -> None:
+        self.flush()
+        self.close_map()
+        self.data_file.close()
+        self.index_file.close()
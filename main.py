@@ -1,24 +1,62 @@
+import argparse
+import os
+import time
+from typing import Optional, Tuple
 import tcod
 import color
 import traceback
 import exceptions
 import input_handlers
+from perf import FrameCounter, timings
 import setup_game
 
+#Events with mouse positions, which are converted from pixels to tiles for the handlers
+MOUSE_EVENTS = (tcod.event.MouseState, tcod.event.MouseButtonEvent)
+#Events that can change the screen without changing the handler, such as moving a cursor.
+#Other events only cause a new frame when the handler changes or the hovered tile does.
+REDRAW_EVENTS = (tcod.event.KeyDown, tcod.event.MouseButtonDown, tcod.event.WindowEvent)
+#Shows or hides the phase timings over any screen, it's never passed to the handlers
+PERF_OVERLAY_KEY = tcod.event.KeySym.F3
+
 def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
     #If the current event handler has an active Engine then save it
     if isinstance(handler, input_handlers.EventHandler):
+        if handler.engine.autosaver:
+            handler.engine.autosaver.close() #Finish any autosave before overwriting it
         handler.engine.save_as(filename)
         print("Game saved")
 
 def main():
+   parser = argparse.ArgumentParser(description="Play Crypt Runner.")
+   parser.add_argument(
+       "--frame-cap", type=float, default=None, help="Most frames to draw per second."
+   )
+   parser.add_argument(
+       "--show-fps", action="store_true", help="Draw the frame rate and frame time."
+   )
+   parser.add_argument(
+       "--perf", action="store_true", help="Start with the phase timings shown, F3 toggles them."
+   )
+   parser.add_argument(
+       "--perf-trace",
+       default=None,
+       help="Write the phase timings of every turn and frame to this file, CSV if it ends in .csv else JSONL.",
+   )
+   args = parser.parse_args()
+   frame_cap: Optional[float] = args.frame_cap
+   show_fps: bool = args.show_fps
+   if args.perf:
+       timings.toggle_overlay()
+   if args.perf_trace:
+       timings.open_trace(args.perf_trace)
+   
     #Screen size variables
    screen_width = 80
    screen_height = 50 
    
    #title of screen
    tileset = tcod.tileset.load_tilesheet(
-       "C:/Users/jay-5/Documents/code/pythonProj/roguelike/pyimg.png", 32, 8, tcod.tileset.CHARMAP_TCOD
+       os.path.join(os.path.dirname(__file__), "pyimg.png"), 32, 8, tcod.tileset.CHARMAP_TCOD
    )
    
    handler: input_handlers.BaseEventHandler = setup_game.MainMenu()
@@ -32,19 +70,54 @@ def main():
    )as context:
        #Numpy accesses 2D arrays in [y, x] order which is pretty unintuitive but should be noted
        root_console = tcod.console.Console(screen_width, screen_height, order="F")
+       frame_counter = FrameCounter()
+       min_frame_time = 1 / frame_cap if frame_cap else 0.0
+       next_frame_time = 0.0 #Earliest time.perf_counter() the frame cap allows a frame at
+       dirty = True #The screen is out of date, nothing is drawn until it is
+       hovered_tile: Optional[Tuple[int, int]] = None
        #Game loop
        #Using engine object to handle screen behavior
        try:
            while True:
-               root_console.clear()
-               handler.on_render(console=root_console)
-               context.present(root_console)
+               started = time.perf_counter()
+               if dirty and started >= next_frame_time:
+                   root_console.clear()
+                   handler.on_render(console=root_console)
+                   if show_fps:
+                       frame_counter.render(root_console)
+                   if timings.show_overlay:
+                       timings.render(root_console)
+                   with timings.phase("context.present"):
+                       context.present(root_console)
+                   frame_counter.record(started, time.perf_counter())
+                   timings.end_frame()
+                   next_frame_time = started + min_frame_time
+                   dirty = False
                
+               #Sleep until there are events, or until the frame cap lets an outdated screen be drawn
+               timeout = max(next_frame_time - time.perf_counter(), 0.0) if dirty else None
                try:
-                   for event in tcod.event.wait():
-                       context.convert_event(event)
-                       handler = handler.handle_events(event)
+                   for event in tcod.event.wait(timeout):
+                       if isinstance(event, tcod.event.KeyDown) and event.sym == PERF_OVERLAY_KEY:
+                           timings.toggle_overlay()
+                           dirty = True
+                           continue
+                       if isinstance(event, MOUSE_EVENTS):
+                           #Handlers read mouse positions in tiles, from the converted copy
+                           event = context.convert_event(event)
+                           if isinstance(event, tcod.event.MouseMotion):
+                               tile = event.integer_position
+                               if tile != hovered_tile:
+                                   hovered_tile = tile
+                                   dirty = True
+                       if isinstance(event, REDRAW_EVENTS):
+                           dirty = True
+                       next_handler = handler.handle_events(event)
+                       if next_handler is not handler: #Includes every action performed
+                           dirty = True
+                       handler = next_handler
                except Exception: #Handle exceptions in game
+                   dirty = True
                    traceback.print_exc() #Print error to stderr
                    #Then print the error to the message log
                    if isinstance(handler, input_handlers.EventHandler):
@@ -59,6 +132,8 @@ def main():
        except BaseException: #Save on ay other unexpected exception
            save_game(handler, "savegame.sav")
            raise
+       finally:
+           timings.close_trace()
                    
                
     
@@ -1,13 +1,25 @@
-from typing import Iterable, List, Reversible, Tuple
+from __future__ import annotations
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Reversible, Sequence, Tuple, TYPE_CHECKING
 import textwrap
 import tcod
 import color 
 
+if TYPE_CHECKING:
+    from journal import MessageJournal
+
+#How many messages a log keeps by default, older ones are dropped as new ones arrive
+DEFAULT_CAPACITY = 1_000
+
 class Message:
     def __init__(self, text: str, fg: Tuple[int, int, int]):
         self.plain_text = text
         self.fg = fg
         self.count = 1
+        #Wrapped lines of full_text by width, only good while count is wrapped_count
+        self.wrapped: Dict[int, List[str]] = {}
+        self.wrapped_count = 1
         
     @property
     def full_text(self) -> str:
@@ -16,9 +28,59 @@ class Message:
             return f"{self.plain_text} (x{self.count})"
         return self.plain_text
     
+    def get_lines(self, width: int) -> List[str]:
+        """Return the full text wrapped to `width`, wrapping it only once per width and count."""
+        if self.wrapped_count != self.count: #Stacking changed the text
+            self.wrapped.clear()
+            self.wrapped_count = self.count
+        lines = self.wrapped.get(width)
+        if lines is None:
+            text = self.full_text
+            if 0 < len(text) <= width and text.isprintable() and not text.endswith(" "):
+                lines = [text] #Already a single line as textwrap would leave it
+            else:
+                lines = list(MessageLog.wrap(text, width))
+            self.wrapped[width] = lines
+        return lines
+    
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = [] 
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        #A ring buffer, appending past the capacity drops the oldest message
+        self.messages: Deque[Message] = deque(maxlen=capacity)
+        #Where dropped messages go once a journal is opened, otherwise they're lost
+        self.journal: Optional[MessageJournal] = None
+        #The journal to open when the first message is dropped, see `open_journal`
+        self.journal_filename: Optional[str] = None
+        
+    @property
+    def capacity(self) -> int:
+        return self.messages.maxlen or 0
+    
+    @property
+    def history(self) -> MessageHistory:
+        """Every message, the journal's first."""
+        return MessageHistory(self)
+        
+    def open_journal(self, filename: str, length: Optional[int] = None) -> None:
+        """Keep the messages this log drops in the journal at `filename`, see MessageJournal.
+        With a `length` of 0 the files are left alone until a message is dropped, so games
+        that never drop one make no journal.
+        """
+        from journal import MessageJournal
+        
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = MessageJournal(filename, length) if length != 0 else None
+        self.journal_filename = filename
+        
+    def append(self, message: Message) -> None:
+        if len(self.messages) == self.capacity and self.journal_filename is not None:
+            if self.journal is None:
+                from journal import MessageJournal
+
+                self.journal = MessageJournal(self.journal_filename, 0)
+            self.journal.append(self.messages[0]) #About to be dropped
+        self.messages.append(message)
         
     def add_message(
         self, text: str, fg: Tuple[int, int, int]= color.white, *, stack: bool = True,
@@ -31,7 +93,7 @@ class MessageLog:
         if stack and self.messages and text == self.messages[-1].plain_text:
             self.messages[-1].count += 1
         else:
-            self.messages.append(Message(text, fg))
+            self.append(Message(text, fg))
             
     def render(
         self, console: tcod.console.Console, x: int, y: int, width: int, height: int,
@@ -64,11 +126,114 @@ class MessageLog:
         The `messages` are rendered at the last message and working
         backwards.
         """
+        cls.render_newest_first(console, x, y, width, height, reversed(messages))
+    
+    @staticmethod
+    def render_newest_first(
+        console: tcod.console.Console,
+        x: int,
+        y: int,
+        width: int,
+        height: int,
+        messages: Iterator[Message],
+    ) -> None:
+        """Render messages given newest first from the bottom of the area up.
+        Only the messages that fit are read, however many `messages` holds.
+        """
         y_offset = height - 1
         
-        for message in reversed(messages):
-            for line in reversed(list(cls.wrap(message.full_text, width))):
+        for message in messages:
+            for line in reversed(message.get_lines(width)):
                 console.print(x=x, y=y + y_offset, string=line, fg=message.fg)
                 y_offset -= 1
                 if y_offset < 0:
                     return # No more space to print messages.
+
+
+class MessageHistory:
+    """A read only sequence of every message of a log, oldest first."""
+    
+    def __init__(self, log: MessageLog):
+        self.journal = log.journal
+        self.messages = log.messages
+        self.journal_length = len(log.journal) if log.journal is not None else 0
+        
+    def __len__(self) -> int:
+        return self.journal_length + len(self.messages)
+    
+    def __getitem__(self, index: int) -> Message:
+        if index < 0:
+            index += len(self)
+        if index < self.journal_length:
+            assert self.journal is not None
+            return self.journal[index]
+        return self.messages[index - self.journal_length]
+
+
+class LineIndex:
+    """The wrapped lines of a sequence of messages, numbered up from the newest line.
+    The line counts are taken from the newest message back and only as far as something
+    asks for, so looking at recent history never reads or wraps the older messages.
+    """
+    
+    def __init__(self, messages: Sequence[Message], width: int):
+        self.messages = messages
+        self.width = width
+        #Number of lines in the newest message, the newest two, and so on
+        self.line_ends: List[int] = []
+        
+    @property
+    def counted_lines(self) -> int:
+        return self.line_ends[-1] if self.line_ends else 0
+    
+    def get_newer_lines(self, index: int) -> int:
+        """Return the number of lines of the messages after message `index`."""
+        newer = len(self.messages) - 1 - index
+        self.count_messages(newer)
+        return self.line_ends[newer - 1] if newer else 0
+    
+    def count_messages(self, number: int) -> None:
+        """Count the lines of the newest `number` messages."""
+        messages, line_ends, width = self.messages, self.line_ends, self.width
+        total = self.counted_lines
+        for index in range(len(messages) - 1 - len(line_ends), len(messages) - 1 - number, -1):
+            total += len(messages[index].get_lines(width))
+            line_ends.append(total)
+            
+    def count_lines(self, lines: int) -> None:
+        """Count messages until `lines` lines are counted or there are none left."""
+        messages, line_ends, width = self.messages, self.line_ends, self.width
+        total = self.counted_lines
+        index = len(messages) - 1 - len(line_ends)
+        while total < lines and index >= 0:
+            total += len(messages[index].get_lines(width))
+            line_ends.append(total)
+            index -= 1
+    
+    def get_message_index(self, line: int) -> int:
+        """Return the index of the message the line belongs to, counting lines up from the newest."""
+        self.count_lines(line + 1)
+        return len(self.messages) - 1 - bisect_right(self.line_ends, line)
+    
+    def get_line(self, line: int) -> Tuple[str, Message]:
+        """Return the text of a line, counting up from the newest, and its message."""
+        newer = bisect_right(self.line_ends, line)
+        message = self.messages[len(self.messages) - 1 - newer]
+        lines = message.get_lines(self.width)
+        first = self.line_ends[newer - 1] if newer else 0
+        return lines[len(lines) - 1 - (line - first)], message
+    
+    def render(
+        self,
+        console: tcod.console.Console,
+        x: int,
+        y: int,
+        height: int,
+        last_message: int,
+    ) -> None:
+        """Render the lines ending with message `last_message` over `height` rows, bottom aligned."""
+        bottom = self.get_newer_lines(last_message)
+        self.count_lines(bottom + height)
+        for row in range(min(height, self.counted_lines - bottom)):
+            text, message = self.get_line(bottom + row)
+            console.print(x=x, y=y + height - 1 - row, string=text, fg=message.fg)
@@ -0,0 +1,182 @@
+#Measurements of the game loop, drawn over the game when asked for
+from __future__ import annotations
+from collections import deque
+import contextlib
+import csv
+import json
+import os
+import time
+from typing import ContextManager, Deque, Dict, IO, Optional, Tuple
+import tcod
+from tcod import libtcodpy
+import color
+
+#The phases of a turn and its frame, in the order they happen
+PHASES = (
+    "action.perform",
+    "handle_enemy_turns",
+    "update_fov",
+    "GameMap.render",
+    "MessageLog.render",
+    "context.present",
+)
+
+
+class FrameCounter:
+    """The frames presented in the last `window` seconds and how long the recent ones took.
+    Frames are only drawn when something changes, so the rate is of the last busy second
+    rather than a steady refresh rate.
+    """
+
+    def __init__(self, window: float = 1.0, samples: int = 60):
+        self.window = window
+        self.frame_ends: Deque[float] = deque() #time.perf_counter() when each frame was presented
+        self.frame_times: Deque[float] = deque(maxlen=samples) #Seconds spent on each frame
+        self.frames = 0
+
+    def record(self, started: float, finished: float) -> None:
+        """Count a frame drawn and presented between the `started` and `finished` times."""
+        self.frames += 1
+        self.frame_times.append(finished - started)
+        self.frame_ends.append(finished)
+        while self.frame_ends[0] < finished - self.window:
+            self.frame_ends.popleft()
+
+    @property
+    def fps(self) -> float:
+        return len(self.frame_ends) / self.window
+
+    @property
+    def frame_time(self) -> float:
+        """Average seconds per frame over the recent frames."""
+        return sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+
+    def render(self, console: tcod.console.Console) -> None:
+        console.print(
+            console.width - 1,
+            0,
+            f"{self.fps:.0f} fps {self.frame_time * 1000:.1f} ms",
+            fg=color.white,
+            bg=color.black,
+            alignment=libtcodpy.RIGHT,
+        )
+
+
+class Phase:
+    """Times one phase each time it's entered, see `Timings.phase`."""
+
+    __slots__ = ("timings", "name", "started")
+
+    def __init__(self, timings: Timings, name: str):
+        self.timings = timings
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+class Timings:
+    """Rolling timings of the phases of each turn and frame, and an optional trace of them.
+    Nothing is measured until `enabled` is set, `phase` then hands out a shared do-nothing
+    context so instrumented code only pays for a method call.
+    """
+
+    def __init__(self, samples: int = 200):
+        self.enabled = False
+        self.show_overlay = False
+        self.samples: Dict[str, Deque[float]] = {
+            name: deque(maxlen=samples) for name in PHASES
+        }
+        self.phases = {name: Phase(self, name) for name in PHASES}
+        self.current: Dict[str, float] = {} #Seconds per phase since the last trace row
+        self.turn = 0
+        self.frame = 0
+        self.trace_file: Optional[IO[str]] = None
+        self.trace_writer: Optional[csv.DictWriter] = None
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Return a context manager timing the phase `name`, one of PHASES."""
+        if not self.enabled:
+            return NO_PHASE
+        return self.phases[name]
+
+    def add(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def toggle_overlay(self) -> None:
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.show_overlay or self.trace_file is not None
+
+    def end_turn(self) -> None:
+        """Write the phases of the turn just taken to the trace, if one is open."""
+        self.turn += 1
+        self.write_row("turn")
+
+    def end_frame(self) -> None:
+        """Write the phases of the frame just presented to the trace, if one is open."""
+        self.frame += 1
+        self.write_row("frame")
+
+    def write_row(self, row_type: str) -> None:
+        """Write what was measured since the last row, which ended a turn or a frame.
+        Several turns can pass between frames, so each gets its own row.
+        """
+        if self.trace_file is not None and self.current:
+            row = {"row": row_type, "frame": self.frame, "turn": self.turn}
+            for name, seconds in self.current.items():
+                row[name] = round(seconds * 1000, 4)
+            if self.trace_writer is not None:
+                self.trace_writer.writerow(row)
+            else:
+                self.trace_file.write(json.dumps(row) + "\n")
+        self.current.clear()
+
+    def open_trace(self, filename: str) -> None:
+        """Stream the milliseconds spent in each phase of every turn and frame to a file.
+        Turns and frames get rows of their own, marked in the "row" column.
+        Files ending in .csv get a CSV table, anything else gets a JSON object per line.
+        """
+        self.close_trace()
+        self.trace_file = open(filename, "w", newline="")
+        if os.path.splitext(filename)[1].lower() == ".csv":
+            self.trace_writer = csv.DictWriter(self.trace_file, ("row", "frame", "turn", *PHASES))
+            self.trace_writer.writeheader()
+        self.enabled = True
+
+    def close_trace(self) -> None:
+        if self.trace_file is not None:
+            self.trace_file.close()
+        self.trace_file = None
+        self.trace_writer = None
+        self.enabled = self.show_overlay
+
+    def get_stats(self, name: str) -> Optional[Tuple[float, float, float]]:
+        """Return the p50, p95 and max seconds of the recent samples of a phase."""
+        samples = sorted(self.samples[name])
+        if not samples:
+            return None
+        last = len(samples) - 1
+        return samples[last // 2], samples[round(last * 0.95)], samples[last]
+
+    def render(self, console: tcod.console.Console) -> None:
+        """Draw the phase table in the top left corner."""
+        width, height = 44, len(PHASES) + 3
+        console.draw_frame(0, 0, width, height, "Timings (ms)", fg=color.white, bg=color.black)
+        console.print(20, 1, "    p50    p95    max", fg=color.white)
+        for i, name in enumerate(PHASES):
+            stats = self.get_stats(name)
+            values = "      -" * 3 if stats is None else "".join(
+                f"{seconds * 1000:7.2f}" for seconds in stats
+            )
+            console.print(1, i + 2, f"{name:<19}{values}", fg=color.white)
+
+
+NO_PHASE: ContextManager[None] = contextlib.nullcontext()
+
+#Shared by the game loop, the handlers and the engine
+timings = Timings()
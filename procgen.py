@@ -1,14 +1,17 @@
 from __future__ import annotations
-import tcod
+import functools
+import itertools
+import numpy as np
 import random
-from typing import Iterator, List, Tuple, TYPE_CHECKING
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING
 import entity_factories
-from game_map import GameMap
+from chunks import DEFAULT_CHUNK_SIZE
+from entity import Entity
+from game_map import ChunkedGameMap, GameMap
 import tile_types
 
 if TYPE_CHECKING:
     from engine import Engine
-    from entity import Entity
 
 #These represent (floor number, number of item/monster)
 max_items_by_floor = [
@@ -43,6 +46,11 @@ enemy_chances: Dict[int, List[Tuple[Entity, int]]] = {
     8: [(entity_factories.ogre, 40)]
 } 
 
+#Floor plans refer to the prototypes by their name in entity_factories
+prototype_names: Dict[Entity, str] = {
+    entity: name for name, entity in vars(entity_factories).items() if isinstance(entity, Entity)
+}
+
 def get_max_value_for_floor(
     weighted_chances_by_floor: List[Tuple[int, int]], floor: int
 ) -> int:
@@ -55,11 +63,36 @@ def get_max_value_for_floor(
             current_value = value
     return current_value
 
-def get_entities_at_random(
+class SpawnTable(NamedTuple):
+    """The weighted chances of one floor, compiled for drawing entities by binary search."""
+    entities: Tuple[Entity, ...]
+    cumulative_weights: Tuple[int, ...]
+    
+    @property
+    def chances(self) -> Dict[str, float]:
+        """The probability of drawing each entity, by name."""
+        if not self.entities:
+            return {}
+        total = self.cumulative_weights[-1]
+        weights = (b - a for a, b in zip((0,) + self.cumulative_weights, self.cumulative_weights))
+        return {entity.name: weight / total for entity, weight in zip(self.entities, weights)}
+    
+    def choose(self, number_of_entities: int, rng: random.Random) -> List[Entity]:
+        if not self.entities:
+            return []
+        return rng.choices(self.entities, cum_weights=self.cumulative_weights, k=number_of_entities)
+
+class FloorSpawns(NamedTuple):
+    """What place_entities draws from on one floor."""
+    max_monsters: int
+    max_items: int
+    monsters: SpawnTable
+    items: SpawnTable
+
+def compile_spawn_table(
     weighted_chances_by_floor: Dict[int, List[Tuple[Entity, int]]],
-    number_of_entities: int,
     floor: int,
-) -> List[Entity]:
+) -> SpawnTable:
     
     entity_weighted_chances = {}
     
@@ -73,20 +106,27 @@ def get_entities_at_random(
                 
                 entity_weighted_chances[entity] = weighted_chance
 
-    entities = list(entity_weighted_chances.keys())
-    entity_weighted_chance_values = list(entity_weighted_chances.values())
-    
-    chosen_entities = random.choices(
-        entities, weights=entity_weighted_chance_values, k=number_of_entities
+    return SpawnTable(
+        tuple(entity_weighted_chances.keys()),
+        tuple(itertools.accumulate(entity_weighted_chances.values())),
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_floor_spawns(floor: int) -> FloorSpawns:
+    """Return the spawn tables of a floor, compiled the first time the floor is asked for."""
+    return FloorSpawns(
+        max_monsters=get_max_value_for_floor(max_monsters_by_floor, floor),
+        max_items=get_max_value_for_floor(max_items_by_floor, floor),
+        monsters=compile_spawn_table(enemy_chances, floor),
+        items=compile_spawn_table(item_chances, floor),
     )
-    return chosen_entities
 
 class RectangularRoom:
     def __init__(self, x: int, y: int, width: int, height: int):
         self.x1 = x
         self.y1 = y
         self.x2 = x + width
-        self.y2 = y + width
+        self.y2 = y + height
         
     
     @property
@@ -110,100 +150,373 @@ class RectangularRoom:
             and self.y2 >= other.y1
         )
 
-def place_entities(
-    room: RectangularRoom, dungeon: GameMap, floor_number: int) -> None:
-    number_of_monsters = random.randint(
-        0, get_max_value_for_floor(max_monsters_by_floor, floor_number)
-    )
-    number_of_items = random.randint(
-        0, get_max_value_for_floor(max_items_by_floor, floor_number)
-    )
-    monsters: List[Entity] = get_entities_at_random(
-        enemy_chances, number_of_monsters, floor_number
-    )
-    items: List[Entity] = get_entities_at_random(
-        item_chances, number_of_items, floor_number
-    )
+class OccupancyGrid:
+    """The tiles covered by rooms, walls included, for testing new rooms against all of them at once."""
+    
+    def __init__(self, width: int, height: int):
+        self.occupied = np.zeros((width, height), dtype=bool, order="F")
+        #get_free_positions masks by room size and their number of free positions, kept current by add
+        self.free_positions: Dict[Tuple[int, int], np.ndarray] = {}
+        self.free_counts: Dict[Tuple[int, int], int] = {}
     
-    for entity in monsters + items:
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
+    def is_free(self, room: RectangularRoom) -> bool:
+        """Return True if the room overlaps no other room, the same test as intersects."""
+        return not self.occupied[room.x1 : room.x2 + 1, room.y1 : room.y2 + 1].any()
+    
+    def add(self, room: RectangularRoom) -> None:
+        self.occupied[room.x1 : room.x2 + 1, room.y1 : room.y2 + 1] = True
+        for size, free_positions in self.free_positions.items():
+            room_width, room_height = size
+            #Rooms of this size overlap the new one from these corners
+            covered = free_positions[
+                max(room.x1 - room_width, 0) : room.x2 + 1,
+                max(room.y1 - room_height, 0) : room.y2 + 1,
+            ]
+            self.free_counts[size] -= np.count_nonzero(covered)
+            covered[...] = False
+    
+    def get_free_positions(self, room_width: int, room_height: int) -> np.ndarray:
+        """Return a mask of the positions where a room of this size fits, indexed by its top left corner."""
+        width, height = self.occupied.shape
+        #Occupied tiles above and left of each corner, so any window is summed in four lookups
+        counts = np.zeros((width + 1, height + 1), dtype=np.int32)
+        counts[1:, 1:] = self.occupied.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+        x2, y2 = room_width + 1, room_height + 1
+        in_window = (
+            counts[x2:, y2:] - counts[:-x2, y2:] - counts[x2:, :-y2] + counts[:-x2, :-y2]
+        )
+        return in_window == 0
+    
+    def sample_free_position(
+        self, room_width: int, room_height: int, rng: random.Random
+    ) -> Optional[Tuple[int, int]]:
+        """Return the top left corner of a random position where the room fits, or None if it fits nowhere."""
+        #Guessing is quick while the map is still fairly empty
+        width, height = self.occupied.shape
+        for _ in range(16):
+            x = rng.randrange(width - room_width)
+            y = rng.randrange(height - room_height)
+            if not self.occupied[x : x + room_width + 1, y : y + room_height + 1].any():
+                return x, y
         
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-           
-           entity.spawn(dungeon, x, y)
+        size = room_width, room_height
+        if size not in self.free_positions:
+            self.free_positions[size] = self.get_free_positions(room_width, room_height)
+            self.free_counts[size] = np.count_nonzero(self.free_positions[size])
+        free_positions = self.free_positions[size]
+        free_count = self.free_counts[size]
+        if not free_count:
+            return None
+        index = np.flatnonzero(free_positions)[rng.randrange(free_count)]
+        x, y = np.unravel_index(index, free_positions.shape)
+        return int(x), int(y)
+
+class FloorPlan:
+    """Everything needed to build a floor, as plain data that pickles quickly.
+    Plans can be made in another process and turned into a GameMap by build_game_map.
+    """
+    
+    def __init__(self, width: int, height: int, floor_number: int):
+        self.width, self.height = width, height
+        self.floor_number = floor_number
+        self.tiles = tile_types.new_tile_grid(width, height, tile_types.wall)
+        self.player_location: Optional[Tuple[int, int]] = None
+        self.downstairs_location = (0, 0)
+        self.upstairs_location: Optional[Tuple[int, int]] = None
+        self.spawns: List[Tuple[str, int, int]] = [] #Prototype name, x, y
+        #Tiles already taken by the player or a spawn
+        self.occupied = np.zeros((width, height), dtype=bool, order="F")
+    
+    def place_player(self, x: int, y: int) -> None:
+        self.player_location = x, y
+        self.occupied[x, y] = True
+    
+    def add_spawn(self, entity: Entity, x: int, y: int) -> None:
+        self.spawns.append((prototype_names[entity], x, y))
+        self.occupied[x, y] = True
+
+def place_entities(
+    room: RectangularRoom, floor_plan: FloorPlan, floor_number: int, rng: random.Random
+) -> None:
+    floor_spawns = get_floor_spawns(floor_number)
+    number_of_monsters = rng.randint(0, floor_spawns.max_monsters)
+    number_of_items = rng.randint(0, floor_spawns.max_items)
+    monsters: List[Entity] = floor_spawns.monsters.choose(number_of_monsters, rng)
+    items: List[Entity] = floor_spawns.items.choose(number_of_items, rng)
+    
+    entities = monsters + items
+    if not entities:
+        return
+    
+    #Draw distinct free tiles of the room for all the entities at once, so none are lost.
+    #Tiles are numbered x + y * width across the inside of the room.
+    inner_x, inner_y = room.inner
+    inner_width = inner_x.stop - inner_x.start
+    occupied = floor_plan.occupied[room.inner]
+    free_tiles: Sequence[int] = range(occupied.size)
+    if occupied.any():
+        free_tiles = np.flatnonzero(~occupied.ravel(order="F")).tolist()
+    
+    for entity, tile in zip(entities, rng.sample(free_tiles, min(len(entities), len(free_tiles)))):
+        y, x = divmod(tile, inner_width)
+        floor_plan.add_spawn(entity, inner_x.start + x, inner_y.start + y)
 
 
 def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
-) -> Iterator[Tuple[int, int]]:
-    """Return an L-shaped tunnel between these two points."""
+    start: Tuple[int, int], end: Tuple[int, int], rng: random.Random
+) -> Iterator[Tuple[slice, slice]]:
+    """Return an L-shaped tunnel between these two points, as the 2D array index of each leg."""
     x1, y1 = start
     x2, y2 = end
-    if random.random() < 0.5: #50% chance.
+    if rng.random() < 0.5: #50% chance.
         #Move horizontally, then vertically.
         corner_x, corner_y = x2, y1
     else:
         #Move vertically, then horizontally.
         corner_x, corner_y = x1, y2
-    #Generate the coordinates for this tunnel.
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        #Yield expressions return a "generator" returning values without exiting function and keeping local state.
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+    #Both legs are straight lines, so each one is a single slice of the map.
+    #Yield expressions return a "generator" returning values without exiting function and keeping local state.
+    yield slice(min(x1, corner_x), max(x1, corner_x) + 1), slice(min(y1, corner_y), max(y1, corner_y) + 1)
+    yield slice(min(corner_x, x2), max(corner_x, x2) + 1), slice(min(corner_y, y2), max(corner_y, y2) + 1)
     
-def generate_dungeon(
+def generate_floor_plan(
     max_rooms: int,
     room_min_size: int,
     room_max_size: int,
     map_width: int,
     map_height: int,
-    engine: Engine,
-) -> GameMap:
-    """Generate a new map."""
-    player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, entities=[player])
+    floor_number: int,
+    rng: random.Random,
+    sample_free_regions: bool = False,
+) -> FloorPlan:
+    """Generate the plan of a new map, this doesn't touch the engine so it can run anywhere.
+    The plan depends only on the arguments, `rng` included.
+    
+    Each of the `max_rooms` attempts places a room at a random position and gives up if it
+    overlaps another. With `sample_free_regions` an overlapping room is instead moved to a
+    random position where it fits, so attempts are only lost once the map is full.
+    """
+    dungeon = FloorPlan(map_width, map_height, floor_number)
     
     rooms: List[RectangularRoom] = []
+    occupancy = OccupancyGrid(map_width, map_height)
+    #Digging through the raw bytes skips numpy converting every field of the tile
+    raw_tiles = dungeon.tiles.view(tile_types.tile_raw_dt)
+    raw_floor = tile_types.floor.view(tile_types.tile_raw_dt)
     
     center_of_last_room = (0, 0)
     
     for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
         
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
+        x = rng.randint(0, dungeon.width - room_width - 1)
+        y = rng.randint(0, dungeon.height - room_height - 1)
         #RectangularRoom class makes rectangles easier to work with.
         
         new_room = RectangularRoom(x, y, room_width, room_height)
         
-        #Run through the other rooms and see if they intersect with this one.
-        if any(new_room.intersects(other_room) for other_room in rooms):
-            continue # This room intersects so go to next 
+        #Check the room against all the others in one go.
+        if not occupancy.is_free(new_room):
+            position = None
+            if sample_free_regions:
+                position = occupancy.sample_free_position(room_width, room_height, rng)
+            if position is None:
+                continue # This room intersects so go to next 
+            new_room = RectangularRoom(*position, room_width, room_height)
         #if there are no intersections then this is valid
+        occupancy.add(new_room)
         #dig out rooms inner area
-        dungeon.tiles[new_room.inner] = tile_types.floor
+        raw_tiles[new_room.inner] = raw_floor
         
         if len(rooms) == 0:
             #The first room, where player starts.
-            player.place(*new_room.center, dungeon)
-            player.x, player.y = new_room.center
+            dungeon.place_player(*new_room.center)
         else: #All rooms after the first.
             #Dig a tunnel between this and previous rooms.
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            for tunnel in tunnel_between(rooms[-1].center, new_room.center, rng):
+                raw_tiles[tunnel] = raw_floor
             
             center_of_last_room = new_room.center
         
         
-        place_entities(new_room, dungeon, engine.game_world.current_floor)
+        place_entities(new_room, dungeon, floor_number, rng)
         
         dungeon.tiles[center_of_last_room] = tile_types.down_stairs
         dungeon.downstairs_location = center_of_last_room
                 
         #Finally, append the new room to the list.
         rooms.append(new_room)
+    
+    #Every floor below the first leads back up from where the player arrives
+    if floor_number > 1 and dungeon.player_location:
+        dungeon.tiles[dungeon.player_location] = tile_types.up_stairs
+        dungeon.upstairs_location = dungeon.player_location
+        
+    return dungeon
+
+def build_game_map(floor_plan: FloorPlan, engine: Engine) -> GameMap:
+    """Turn a floor plan into a map and move the player onto it."""
+    dungeon = GameMap(engine, floor_plan.width, floor_plan.height, tiles=floor_plan.tiles)
+    dungeon.downstairs_location = floor_plan.downstairs_location
+    dungeon.upstairs_location = floor_plan.upstairs_location
+    if floor_plan.player_location:
+        engine.player.place(*floor_plan.player_location, dungeon)
+    for name, x, y in floor_plan.spawns:
+        getattr(entity_factories, name).spawn(dungeon, x, y)
+    return dungeon
+
+def generate_dungeon(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    engine: Engine,
+) -> GameMap:
+    """Generate a new map for the current floor of the engine's game world."""
+    game_world = engine.game_world
+    floor_plan = generate_floor_plan(
+        max_rooms=max_rooms,
+        room_min_size=room_min_size,
+        room_max_size=room_max_size,
+        map_width=map_width,
+        map_height=map_height,
+        floor_number=game_world.current_floor,
+        rng=game_world.get_rng("procgen", game_world.current_floor),
+    )
+    return build_game_map(floor_plan, engine)
+
+#A chunk of cave is populated as if it held this many rooms
+CAVE_ROOMS_PER_CHUNK = 4
+
+class CaveGenerator:
+    """Makes the tiles and entities of a cave floor one chunk at a time.
+    A chunk is random noise smoothed by a cellular automaton, with the noise of each chunk
+    seeded by its position, so a chunk comes out the same whenever it's made and agrees
+    with its neighbors along their borders. A tunnel runs along the middle row and column
+    of every chunk, which connects the whole cave, the player and stairs start on it.
+    """
+    
+    def __init__(
+        self,
+        seed: int,
+        floor_number: int,
+        width: int,
+        height: int,
+        chunk_size: int,
+        wall_chance: float = 0.45,
+        smoothing_steps: int = 4,
+    ):
+        self.seed = seed
+        self.floor_number = floor_number
+        self.width, self.height = width, height
+        self.chunk_size = chunk_size
+        self.wall_chance = wall_chance
+        self.smoothing_steps = smoothing_steps
+        
+        chunks_x, chunks_y = -(-width // chunk_size), -(-height // chunk_size)
+        start_chunk = chunks_x // 2, chunks_y // 2
+        self.player_location = self.get_chunk_center(*start_chunk)
+        #The stairs down are in a chunk at least a quarter of the cave away from the start
+        rng = self.get_rng("cave-stairs")
+        distance = max(1, min(chunks_x, chunks_y) // 4)
+        stairs_chunks = [
+            (chunk_x, chunk_y)
+            for chunk_x in range(chunks_x)
+            for chunk_y in range(chunks_y)
+            if max(abs(chunk_x - start_chunk[0]), abs(chunk_y - start_chunk[1])) >= distance
+        ]
+        self.downstairs_location = self.get_chunk_center(*rng.choice(stairs_chunks or [start_chunk]))
+        self.upstairs_location = self.player_location if floor_number > 1 else None
+    
+    def get_rng(self, stream: str, *key: int) -> random.Random:
+        return random.Random(":".join(map(str, (self.seed, stream, self.floor_number, *key))))
+    
+    def get_chunk_center(self, chunk_x: int, chunk_y: int) -> Tuple[int, int]:
+        size = self.chunk_size
+        return (
+            min(chunk_x * size + size // 2, self.width - 1),
+            min(chunk_y * size + size // 2, self.height - 1),
+        )
+    
+    def get_noise(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Return True where the noise of a chunk starts out as wall, all wall outside the map."""
+        size = self.chunk_size
+        if not (0 <= chunk_x * size < self.width and 0 <= chunk_y * size < self.height):
+            return np.ones((size, size), dtype=bool)
+        noise = np.random.default_rng(self.get_rng("cave", chunk_x, chunk_y).getrandbits(64))
+        return noise.random((size, size)) < self.wall_chance
+    
+    def get_walls(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Return True where a chunk has walls."""
+        size = self.chunk_size
+        #Smoothing reads a tile's neighbors, so the noise of the chunks around is needed too
+        walls = np.block(
+            [[self.get_noise(chunk_x + i, chunk_y + j) for j in (-1, 0, 1)] for i in (-1, 0, 1)]
+        )
+        for _ in range(self.smoothing_steps):
+            width, height = walls.shape
+            neighbors = sum(
+                walls[i : width - 2 + i, j : height - 2 + j].astype(np.int8)
+                for i in range(3)
+                for j in range(3)
+            )
+            walls = neighbors >= 5 #Walls where most of the 3x3 area is wall
+        margin = size - self.smoothing_steps
+        walls = walls[margin : margin + size, margin : margin + size]
+        
+        walls[size // 2, :] = False #The tunnels joining every chunk to its neighbors
+        walls[:, size // 2] = False
+        #Nothing outside the map can be walked on
+        left, top = chunk_x * size, chunk_y * size
+        walls[max(self.width - left, 0) :, :] = True
+        walls[:, max(self.height - top, 0) :] = True
+        return walls
+    
+    def generate_chunk(self, game_map: GameMap, key: Tuple[int, int]) -> None:
+        """Make the tiles of a chunk of `game_map` and spawn its entities."""
+        size = self.chunk_size
+        chunk_x, chunk_y = key
+        walls = self.get_walls(chunk_x, chunk_y)
+        tiles = tile_types.from_tile_ids(np.where(walls, 0, 1).astype(np.uint8))
+        
+        left, top = chunk_x * size, chunk_y * size
+        stairs = [(self.downstairs_location, tile_types.down_stairs)]
+        if self.upstairs_location is not None:
+            stairs.append((self.upstairs_location, tile_types.up_stairs))
+        for (x, y), tile in stairs:
+            if left <= x < left + size and top <= y < top + size:
+                tiles[x - left, y - top] = tile
+        game_map.tiles.chunks[key] = tiles
         
-    return dungeon  
\ No newline at end of file
+        #Entities go anywhere on the floor but the crossing of the tunnels, where stairs go
+        rng = self.get_rng("cave-spawns", chunk_x, chunk_y)
+        floor_spawns = get_floor_spawns(self.floor_number)
+        entities: List[Entity] = []
+        for _ in range(CAVE_ROOMS_PER_CHUNK):
+            entities += floor_spawns.monsters.choose(rng.randint(0, floor_spawns.max_monsters), rng)
+            entities += floor_spawns.items.choose(rng.randint(0, floor_spawns.max_items), rng)
+        free = ~walls
+        free[size // 2, size // 2] = False
+        free_tiles = np.flatnonzero(free.ravel(order="F")).tolist()
+        for entity, tile in zip(entities, rng.sample(free_tiles, min(len(entities), len(free_tiles)))):
+            y, x = divmod(tile, size)
+            entity.spawn(game_map, left + x, top + y)
+
+def generate_cave_map(
+    map_width: int,
+    map_height: int,
+    floor_number: int,
+    seed: int,
+    engine: Engine,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ChunkedGameMap:
+    """Return a cave floor which makes its chunks as the player explores, with the player on it."""
+    generator = CaveGenerator(seed, floor_number, map_width, map_height, chunk_size)
+    dungeon = ChunkedGameMap(engine, map_width, map_height, generator, chunk_size)
+    dungeon.downstairs_location = generator.downstairs_location
+    dungeon.upstairs_location = generator.upstairs_location
+    engine.player.place(*generator.player_location, dungeon)
+    dungeon.update_active_window(*generator.player_location)
+    return dungeon
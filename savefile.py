@@ -0,0 +1,387 @@
+#Versioned save files made of independently compressed sections.
+#A save file is a header followed by named sections:
+#    header:  magic (8s), version (H), codec (B), section count (B)
+#    section: name length (B), name, raw length (Q), stored length (Q), stored bytes
+#Each section is compressed on its own with the codec named in the header, and numpy
+#arrays are written straight from their buffers instead of going through pickle.
+from __future__ import annotations
+import copyreg
+import io
+import lzma
+import os
+import pickle
+import struct
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+from chunks import ChunkedArray
+from engine import Engine
+from game_map import ChunkedGameMap, GameMap, GameWorld
+from message_log import Message
+import tile_types
+
+if TYPE_CHECKING:
+    from entity import Entity
+
+MAGIC = b"CRYPTSAV"
+#2 added the run seed and random state of the game world
+#3 added the up stairs and the floors the player has left
+#4 added chunked maps, saved in a "chunks" section instead of tiles, visible and explored
+#5 moved older messages to a journal next to the save, "messages" only holds the recent ones
+VERSION = 5
+
+HEADER = struct.Struct("<8sHBB")
+SECTION_LENGTHS = struct.Struct("<QQ")
+
+CODECS: Dict[str, Tuple[int, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (0, bytes, bytes),
+    "zlib": (1, lambda data: zlib.compress(data, 1), zlib.decompress),
+    "lzma": (2, lzma.compress, lzma.decompress),
+}
+CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+DEFAULT_CODEC = "zlib"
+
+
+def restore_game_map() -> GameMap:
+    #Stands in for the map while pickled, EntityUnpickler swaps in the map being loaded
+    raise pickle.UnpicklingError("Entities must be loaded with EntityUnpickler")
+
+
+def restore_engine() -> Engine:
+    raise pickle.UnpicklingError("Entities must be loaded with EntityUnpickler")
+
+
+class EntityPickler(pickle.Pickler):
+    """Pickle entities without following their references back into the map or engine."""
+    #A dispatch table keeps the per-object checks in C, unlike persistent_id
+    dispatch_table = copyreg.dispatch_table.copy()
+    #Looked up by exact type, so every kind of map is listed
+    dispatch_table[GameMap] = lambda game_map: (restore_game_map, ())
+    dispatch_table[ChunkedGameMap] = dispatch_table[GameMap]
+    dispatch_table[Engine] = lambda engine: (restore_engine, ())
+
+
+class EntityUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, game_map: GameMap):
+        super().__init__(file)
+        self.game_map = game_map
+
+    def find_class(self, module: str, name: str) -> Any:
+        if module == __name__ and name == "restore_game_map":
+            return lambda: self.game_map
+        if module == __name__ and name == "restore_engine":
+            return lambda: self.game_map.engine
+        return super().find_class(module, name)
+
+
+def pack_mask(mask: np.ndarray) -> bytes:
+    return np.packbits(mask.ravel(order="F")).tobytes()
+
+
+def unpack_mask(data: bytes, width: int, height: int) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=width * height)
+    return bits.astype(bool).reshape((width, height), order="F")
+
+
+def encode_chunked_array(array: ChunkedArray, encode: Callable[[np.ndarray], bytes]) -> Tuple[Any, Dict[Tuple[int, int], bytes]]:
+    return array.fill_value[()], {key: encode(chunk) for key, chunk in array.chunks.items()}
+
+
+def decode_chunked_array(
+    array: ChunkedArray, data: Tuple[Any, Dict[Tuple[int, int], bytes]], decode: Callable[[bytes], np.ndarray]
+) -> None:
+    fill_value, chunks = data
+    array[...] = fill_value
+    for key, chunk in chunks.items():
+        array.chunks[key] = decode(chunk)
+
+
+def encode_chunks(game_map: ChunkedGameMap) -> bytes:
+    """Return the allocated chunks of a map and the generator making the others."""
+    size = game_map.chunk_size
+    state = {
+        "chunk_size": size,
+        "active_radius": game_map.active_radius,
+        "flow_radius": game_map.flow_radius,
+        "generator": game_map.generator,
+        "generated": sorted(game_map.generated),
+        "tiles": encode_chunked_array(
+            game_map.tiles, lambda chunk: tile_types.to_tile_ids(chunk).tobytes(order="F")
+        ),
+        "visible": encode_chunked_array(game_map.visible, pack_mask),
+        "explored": encode_chunked_array(game_map.explored, pack_mask),
+    }
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_chunks(data: bytes, engine: Engine, width: int, height: int) -> ChunkedGameMap:
+    """Rebuild a map from `encode_chunks`, without its entities."""
+    state = pickle.loads(data)
+    size = state["chunk_size"]
+    game_map = ChunkedGameMap(
+        engine,
+        width,
+        height,
+        state["generator"],
+        size,
+        active_radius=state["active_radius"],
+        flow_radius=state["flow_radius"],
+    )
+    game_map.generated.update(map(tuple, state["generated"]))
+    decode_chunked_array(
+        game_map.tiles,
+        state["tiles"],
+        lambda chunk: tile_types.from_tile_ids(
+            np.frombuffer(chunk, dtype=np.uint8).reshape((size, size), order="F")
+        ),
+    )
+    decode_chunked_array(game_map.visible, state["visible"], lambda chunk: unpack_mask(chunk, size, size))
+    decode_chunked_array(game_map.explored, state["explored"], lambda chunk: unpack_mask(chunk, size, size))
+    return game_map
+
+
+def encode_map_arrays(game_map: GameMap) -> Dict[str, bytes]:
+    """Return the sections holding the tiles, visible and explored arrays of a map."""
+    if isinstance(game_map, ChunkedGameMap):
+        return {"chunks": encode_chunks(game_map)}
+    return {
+        "tiles": game_map.tiles.view(tile_types.tile_raw_dt).tobytes(order="F"),
+        "visible": pack_mask(game_map.visible),
+        "explored": pack_mask(game_map.explored),
+    }
+
+
+def encode_sections(engine: Engine) -> Dict[str, bytes]:
+    """Return the uncompressed sections describing this engine."""
+    game_map = engine.game_map
+    game_world = engine.game_world
+    journal = getattr(engine.message_log, "journal", None)
+    if journal is not None:
+        journal.flush() #Everything the save counts is on disk before the save is
+    meta = {
+        "map_width": game_map.width,
+        "map_height": game_map.height,
+        "downstairs_location": game_map.downstairs_location,
+        "upstairs_location": getattr(game_map, "upstairs_location", None),
+        "mouse_location": engine.mouse_location,
+        #The journal may be longer by the time it's loaded, it's cut back to this
+        "journal_length": len(journal) if journal is not None else 0,
+        "game_world": {
+            "map_width": game_world.map_width,
+            "map_height": game_world.map_height,
+            "max_rooms": game_world.max_rooms,
+            "room_min_size": game_world.room_min_size,
+            "room_max_size": game_world.room_max_size,
+            "current_floor": game_world.current_floor,
+            #Engines from the old whole-Engine pickles have no seed yet
+            "seed": getattr(game_world, "seed", None),
+            "caves": getattr(game_world, "caves", False),
+        },
+        "rng_state": game_world.rng.getstate() if hasattr(game_world, "rng") else None,
+    }
+
+    entities = io.BytesIO()
+    EntityPickler(entities, pickle.HIGHEST_PROTOCOL).dump((engine.player, list(game_map.entities)))
+
+    messages = [
+        (message.plain_text, message.fg, message.count)
+        for message in engine.message_log.messages
+    ]
+    floor_cache = getattr(game_world, "floor_cache", None)
+    floors = floor_cache.export() if floor_cache is not None else {}
+    return {
+        "meta": pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL),
+        **encode_map_arrays(game_map),
+        "entities": entities.getvalue(),
+        "messages": pickle.dumps(messages, protocol=pickle.HIGHEST_PROTOCOL),
+        "floors": pickle.dumps(floors, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+
+
+def decode_sections(sections: Dict[str, bytes], journal_filename: Optional[str] = None) -> Engine:
+    """Rebuild an engine from the sections written by `encode_sections`.
+    Its message journal is opened from `journal_filename` if one is given.
+    """
+    meta = pickle.loads(sections["meta"])
+    width, height = meta["map_width"], meta["map_height"]
+
+    #The map is made first so the entities can refer to it, the engine is attached after
+    game_map: GameMap
+    if "chunks" in sections:
+        game_map = decode_chunks(sections["chunks"], None, width, height)  # type: ignore[arg-type]
+    else:
+        game_map = GameMap(None, width, height)  # type: ignore[arg-type]
+        game_map.tiles.view(tile_types.tile_raw_dt)[...] = np.frombuffer(
+            sections["tiles"], dtype=tile_types.tile_raw_dt
+        ).reshape((width, height), order="F")
+        game_map.visible[...] = unpack_mask(sections["visible"], width, height)
+        game_map.explored[...] = unpack_mask(sections["explored"], width, height)
+    game_map.downstairs_location = tuple(meta["downstairs_location"])
+    if meta.get("upstairs_location") is not None:
+        game_map.upstairs_location = tuple(meta["upstairs_location"])
+
+    player: Entity
+    player, entities = EntityUnpickler(io.BytesIO(sections["entities"]), game_map).load()
+    for entity in entities:
+        game_map.add_entity(entity)
+
+    engine = Engine(player=player)
+    game_map.engine = engine
+    engine.game_map = game_map
+    game_map.update_active_window(player.x, player.y)
+    engine.game_world = GameWorld(engine=engine, **meta["game_world"])
+    if meta.get("rng_state") is not None:
+        engine.game_world.rng.setstate(meta["rng_state"])
+    if "floors" in sections:
+        engine.game_world.floor_cache.restore(pickle.loads(sections["floors"]))
+    engine.mouse_location = tuple(meta["mouse_location"])
+
+    if journal_filename is not None:
+        engine.message_log.open_journal(journal_filename, meta.get("journal_length", 0))
+    for text, fg, count in pickle.loads(sections["messages"]):
+        message = Message(text, fg)
+        message.count = count
+        engine.message_log.append(message) #Messages past the capacity go to the journal
+    return engine
+
+
+def dump_sections(f: BinaryIO, sections: Dict[str, bytes], codec: str = DEFAULT_CODEC) -> None:
+    """Compress the sections and write them to an open binary file."""
+    codec_id, compress, _ = CODECS[codec]
+    f.write(HEADER.pack(MAGIC, VERSION, codec_id, len(sections)))
+    for name, data in sections.items():
+        stored = compress(data)
+        encoded_name = name.encode("ascii")
+        f.write(struct.pack("<B", len(encoded_name)))
+        f.write(encoded_name)
+        f.write(SECTION_LENGTHS.pack(len(data), len(stored)))
+        f.write(stored)
+
+
+def write_sections(filename: str, sections: Dict[str, bytes], codec: str = DEFAULT_CODEC) -> None:
+    """Compress and write the sections, replacing `filename` only once they are all on disk."""
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "wb") as f:
+        dump_sections(f, sections, codec)
+    os.replace(temp_filename, filename)
+
+
+def read_sections(data: bytes) -> Dict[str, bytes]:
+    magic, version, codec_id, section_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a save file")
+    if version > VERSION:
+        raise ValueError(f"Save file version {version} is newer than this game supports")
+    _, _, decompress = CODECS[CODEC_NAMES[codec_id]]
+
+    sections: Dict[str, bytes] = {}
+    offset = HEADER.size
+    for _ in range(section_count):
+        name_length = data[offset]
+        name = data[offset + 1 : offset + 1 + name_length].decode("ascii")
+        offset += 1 + name_length
+        raw_length, stored_length = SECTION_LENGTHS.unpack_from(data, offset)
+        offset += SECTION_LENGTHS.size
+        section = decompress(data[offset : offset + stored_length])
+        offset += stored_length
+        if len(section) != raw_length:
+            raise ValueError(f"Save file section {name!r} is corrupt")
+        sections[name] = section
+    return sections
+
+
+def encode_floor(game_map: GameMap, codec: str = DEFAULT_CODEC) -> bytes:
+    """Compress a floor the player has left into the sections format.
+    Only what can't be rebuilt is kept: tile IDs, the explored tiles and the entities.
+    Chunked maps keep their chunks as they would in a save file.
+    """
+    player = game_map.engine.player
+    meta = {
+        "map_width": game_map.width,
+        "map_height": game_map.height,
+        "downstairs_location": game_map.downstairs_location,
+        "upstairs_location": game_map.upstairs_location,
+    }
+    entities = io.BytesIO()
+    EntityPickler(entities, pickle.HIGHEST_PROTOCOL).dump(
+        [entity for entity in game_map.entities if entity is not player]
+    )
+    sections = {"meta": pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)}
+    if isinstance(game_map, ChunkedGameMap):
+        sections["chunks"] = encode_chunks(game_map)
+    else:
+        sections["tile_ids"] = tile_types.to_tile_ids(game_map.tiles).tobytes(order="F")
+        sections["explored"] = pack_mask(game_map.explored)
+    sections["entities"] = entities.getvalue()
+    data = io.BytesIO()
+    dump_sections(data, sections, codec)
+    return data.getvalue()
+
+
+def compress_floor(data: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    """Return a floor from `encode_floor` compressed with `codec`, as it is if it already is."""
+    if CODEC_NAMES[HEADER.unpack_from(data, 0)[2]] == codec:
+        return data
+    compressed = io.BytesIO()
+    dump_sections(compressed, read_sections(data), codec)
+    return compressed.getvalue()
+
+
+def decode_floor(data: bytes, engine: Engine) -> GameMap:
+    """Rebuild a floor compressed by `encode_floor`."""
+    sections = read_sections(data)
+    meta = pickle.loads(sections["meta"])
+    width, height = meta["map_width"], meta["map_height"]
+    game_map: GameMap
+    if "chunks" in sections:
+        game_map = decode_chunks(sections["chunks"], engine, width, height)
+    else:
+        tile_ids = np.frombuffer(sections["tile_ids"], dtype=np.uint8).reshape((width, height), order="F")
+        game_map = GameMap(engine, width, height, tiles=tile_types.from_tile_ids(tile_ids))
+        game_map.explored[...] = unpack_mask(sections["explored"], width, height)
+    game_map.downstairs_location = tuple(meta["downstairs_location"])
+    if meta["upstairs_location"] is not None:
+        game_map.upstairs_location = tuple(meta["upstairs_location"])
+    for entity in EntityUnpickler(io.BytesIO(sections["entities"]), game_map).load():
+        game_map.add_entity(entity)
+    return game_map
+
+
+def get_journal_filename(filename: str) -> str:
+    """Return where the message journal of a save file is kept."""
+    return os.path.splitext(filename)[0] + ".journal"
+
+
+def delete(filename: str) -> None:
+    """Remove a save file and its message journal, whichever of them exist."""
+    journal_filename = get_journal_filename(filename)
+    for path in (filename, journal_filename, journal_filename + ".idx"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def save(engine: Engine, filename: str, codec: str = DEFAULT_CODEC) -> None:
+    """Save the engine to a file, compressing each section with `codec`."""
+    write_sections(filename, encode_sections(engine), codec)
+    journal = engine.message_log.journal
+    if journal is not None:
+        journal.copy_to(get_journal_filename(filename))
+
+
+def load(filename: str) -> Engine:
+    """Load an engine from a save file, including the older whole-Engine pickles."""
+    with open(filename, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        #Saves from before the sectioned format are a single lzma compressed pickle.
+        #Passing them through the sections rebuilds the map state they don't carry.
+        engine = decode_sections(
+            encode_sections(pickle.loads(lzma.decompress(data))), get_journal_filename(filename)
+        )
+    else:
+        engine = decode_sections(read_sections(data), get_journal_filename(filename))
+    assert isinstance(engine, Engine)
+    return engine
@@ -1,31 +1,44 @@
 #Handle loading and initialization of game sessions
 from __future__ import annotations
-import copy
+import functools
+import os
 from typing import Optional
-import lzma
-import pickle
 import traceback
+import numpy as np
 import tcod
 from tcod import libtcodpy
+from autosave import Autosaver
 import color
 from engine import Engine
 import entity_factories
 from game_map import GameWorld
 import input_handlers
+import savefile
 
 
-background_image = tcod.image.load("C:/Users/jay-5/Documents/code/pythonProj/roguelike/menu_background.png")[:, :, :3]
+BACKGROUND_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "menu_background.png")
 
-def new_game() -> Engine:
-    #Return a new game session as an Engine Instance
-    map_width = 80
-    map_height = 45
-    
-    room_max_size = 10
-    room_min_size = 6
-    max_rooms = 30
+#Width and height of the floors of a cave game
+CAVE_MAP_SIZE = 2048
+
+@functools.lru_cache(maxsize=None)
+def get_background_image() -> np.ndarray:
+    #Loaded on first use so the game logic can be imported without the menu assets
+    return tcod.image.load(BACKGROUND_IMAGE_PATH)[:, :, :3]
 
-    player = copy.deepcopy(entity_factories.player)
+def new_game(
+    map_width: int = 80,
+    map_height: int = 45,
+    room_max_size: int = 10,
+    room_min_size: int = 6,
+    max_rooms: int = 30,
+    seed: Optional[int] = None,
+    caves: bool = False,
+) -> Engine:
+    #Return a new game session as an Engine Instance, the whole run is reproduced by its seed
+    #With caves every floor is a chunked map, much larger than the screen
+
+    player = entity_factories.player.clone()
     
     engine = Engine(player=player)
     
@@ -36,6 +49,8 @@ def new_game() -> Engine:
         room_max_size=room_max_size,
         map_width=map_width,
         map_height=map_height,
+        seed=seed,
+        caves=caves,
     )
     engine.game_world.generate_floor()
     engine.update_fov()
@@ -44,8 +59,8 @@ def new_game() -> Engine:
         "Hello adventurer, steel your resolve as you traverse the crypt", color.welcome_text
     )
     
-    dagger = copy.deepcopy(entity_factories.dagger)
-    leather_armor = copy.deepcopy(entity_factories.leather_armor)
+    dagger = entity_factories.dagger.clone()
+    leather_armor = entity_factories.leather_armor.clone()
     
     dagger.parent = player.inventory
     leather_armor.parent = player.inventory
@@ -60,17 +75,14 @@ def new_game() -> Engine:
 
 def load_game(filename: str) -> Engine:
     #Load an Engine instance from a file
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
-    assert isinstance(engine, Engine)
-    return engine
+    return savefile.load(filename)
 
 class MainMenu(input_handlers.BaseEventHandler):
     #Handle the main menu rendering and input
     
     def on_render(self, console: tcod.Console) -> None:
         #Render the main menu on a background Image
-        console.draw_semigraphics(background_image, -100, -50)
+        console.draw_semigraphics(get_background_image(), -100, -50)
         
         console.print(
             console.width // 2,
@@ -89,7 +101,7 @@ class MainMenu(input_handlers.BaseEventHandler):
         
         menu_width = 24
         for i, text in enumerate(
-            ["[N] Play a new game", "[C] Continue last game", "[Q] Quit" ]
+            ["[N] Play a new game", "[V] Play in the caves", "[C] Continue last game", "[Q] Quit" ]
         ):
             console.print(
                 console.width // 2,
@@ -107,13 +119,23 @@ class MainMenu(input_handlers.BaseEventHandler):
             raise SystemExit()
         elif event.sym == tcod.event.KeySym.c:
             try:
-                return input_handlers.MainGameEventHandler(load_game("savegame.sav"))
+                engine = load_game("savegame.sav")
             except FileNotFoundError:
                 return input_handlers.PopupMessage(self, "No save to load")
             except Exception as exc:
                 traceback.print_exc() #Print to stderr
                 return input_handlers.PopupMessage(self, f"Failed to load save:\n{exc}")
         elif event.sym == tcod.event.KeySym.n:
-            return input_handlers.MainGameEventHandler(new_game())
+            engine = new_game()
+        elif event.sym == tcod.event.KeySym.v:
+            engine = new_game(map_width=CAVE_MAP_SIZE, map_height=CAVE_MAP_SIZE, caves=True)
+        else:
+            return None
         
-        return None
\ No newline at end of file
+        if engine.message_log.journal_filename is None:
+            #New games replace the old save and its journal together, before either is written
+            savefile.delete("savegame.sav")
+            engine.message_log.open_journal(savefile.get_journal_filename("savegame.sav"), 0)
+        engine.autosaver = Autosaver("savegame.sav")
+        engine.game_world.enable_pregeneration()
+        return input_handlers.MainGameEventHandler(engine)
\ No newline at end of file
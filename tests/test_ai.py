@@ -0,0 +1,44 @@
+from __future__ import annotations
+from typing import Tuple
+
+from components.ai import plan_hostile_turns
+from engine import Engine
+import entity_factories
+from entity import Actor
+from game_map import GameMap
+import tile_types
+
+
+def build_field(player: Tuple[int, int], chaser: Tuple[int, int]) -> Tuple[Engine, Actor]:
+    """Return an open, fully visible floor with the player and a goblin chasing them."""
+    engine = Engine(player=entity_factories.player.clone())
+    game_map = GameMap(engine, 30, 20)
+    engine.game_map = game_map
+    game_map.tiles[1:-1, 1:-1] = tile_types.floor
+    game_map.visible[:] = True
+    engine.player.place(*player, game_map)
+    return engine, entity_factories.goblin.spawn(game_map, *chaser)
+
+
+def chebyshev(a: Tuple[int, int], b: Tuple[int, int]) -> int:
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+def test_chase_only_plans_steps_towards_the_player() -> None:
+    engine, goblin = build_field((10, 10), (14, 10))
+    plan = plan_hostile_turns(engine, [goblin])[0]
+    assert isinstance(plan, list) and plan
+    assert plan[0] == (13, 10)
+    for step in plan:
+        assert chebyshev(step, (10, 10)) < 4
+
+
+def test_blocked_chaser_waits_instead_of_moving_away() -> None:
+    engine, goblin = build_field((10, 10), (14, 10))
+    plan = plan_hostile_turns(engine, [goblin])[0]
+    #Enemies that moved earlier in the turn take every tile closer to the player
+    for x, y in ((13, 9), (13, 10), (13, 11)):
+        entity_factories.goblin.spawn(engine.game_map, x, y)
+    goblin.ai.plan, goblin.ai.planned = plan, True
+    goblin.ai.perform()
+    assert (goblin.x, goblin.y) == (14, 10)
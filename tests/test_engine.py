@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import setup_game
+
+
+def test_update_fov_without_a_move_skips_the_fov_cache() -> None:
+    engine = setup_game.new_game(seed=1)
+    fov_cache = engine.game_map.fov_cache
+    engine.update_fov()
+    lookups = fov_cache.hits + fov_cache.misses
+    engine.update_fov()
+    assert fov_cache.hits + fov_cache.misses == lookups
@@ -0,0 +1,36 @@
+from __future__ import annotations
+import os
+from typing import List, Tuple
+
+import pytest
+
+from actions import TakeStairsAction, WaitAction
+from engine import Engine
+import input_handlers
+import savefile
+import setup_game
+
+
+def snapshot(engine: Engine) -> List[Tuple[str, int, int, int]]:
+    return sorted(
+        (actor.name, actor.x, actor.y, actor.fighter.hp) for actor in engine.game_map.actors
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4, 5])
+def test_saved_copy_plays_like_the_live_game_after_ascending(seed: int, tmp_path: str) -> None:
+    """The floor above is kept live in one copy and compressed in the other, it must not matter."""
+    engine = setup_game.new_game(seed=seed)
+    engine.player.fighter.base_defense = 1_000 #Both copies live through the whole run
+    engine.game_world.generate_floor()
+
+    filename = os.path.join(tmp_path, "game.sav")
+    engine.save_as(filename)
+    loaded = savefile.load(filename)
+
+    actions = [TakeStairsAction] + [WaitAction] * 20
+    for turn, action in enumerate(actions):
+        for copy in (engine, loaded):
+            assert input_handlers.EventHandler(copy).handle_action(action(copy.player))
+        assert engine.game_world.current_floor == loaded.game_world.current_floor == 1
+        assert snapshot(engine) == snapshot(loaded), f"The copies split on turn {turn}"
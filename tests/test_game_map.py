@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from actions import PickupAction
+import entity_factories
+import render_functions
+import setup_game
+
+
+def test_entities_on_a_tile_keep_the_order_they_arrived_in() -> None:
+    engine = setup_game.new_game(seed=1)
+    game_map = engine.game_map
+    x, y = engine.player.x, engine.player.y
+    prototypes = [
+        entity_factories.pyroclasm_scroll,
+        entity_factories.health_potion,
+        entity_factories.lightning_scroll,
+        entity_factories.confusion_scroll,
+        entity_factories.blizzard_scroll,
+        entity_factories.greater_health_potion,
+    ]
+    items = [prototype.spawn(game_map, x, y) for prototype in prototypes]
+    game_map.visible[x, y] = True
+
+    names = render_functions.get_names_at_location(x, y, game_map)
+    assert names == ", ".join(["Player"] + [item.name for item in items]).capitalize()
+
+    engine.player.place(x + 1, y, game_map)
+    engine.player.place(x, y, game_map) #Arriving last puts the player at the end
+    PickupAction(engine.player).perform()
+    assert engine.player.inventory.items[-1] is items[0]
+    assert list(game_map.get_entities_at_location(x, y)) == [*items[1:], engine.player]
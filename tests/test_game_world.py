@@ -0,0 +1,21 @@
+from __future__ import annotations
+from concurrent.futures import Future
+
+import setup_game
+
+
+def test_cave_worlds_are_not_pregenerated() -> None:
+    engine = setup_game.new_game(map_width=2048, map_height=2048, seed=1, caves=True)
+    engine.game_world.enable_pregeneration()
+    assert not engine.game_world.pregenerate
+    assert engine.game_world.next_floor is None
+
+
+def test_a_plan_for_another_floor_is_cancelled() -> None:
+    engine = setup_game.new_game(seed=1)
+    game_world = engine.game_world
+    future: Future = Future()
+    game_world.next_floor = game_world.current_floor + 2, future
+    assert game_world.take_pregenerated_floor() is None
+    assert future.cancelled()
+    assert game_world.next_floor is None
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import os
+
+import pytest
+
+import color
+import exceptions
+import input_handlers
+from message_log import MessageLog
+import savefile
+import setup_game
+
+
+def test_journal_is_made_when_the_first_message_is_dropped(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "game.journal")
+    log = MessageLog(capacity=3)
+    log.open_journal(filename, 0)
+    for i in range(3):
+        log.add_message(f"Message {i}", color.white)
+    assert log.journal is None
+    assert not os.path.exists(filename)
+
+    log.add_message("Message 3", color.white)
+    assert log.journal is not None
+    assert [message.plain_text for message in log.history] == [f"Message {i}" for i in range(4)]
+    log.journal.close()
+
+
+def test_loading_a_save_without_a_journal_makes_no_journal(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "game.sav")
+    savefile.save(setup_game.new_game(seed=1), filename)
+    loaded = savefile.load(filename)
+    assert loaded.message_log.journal is None
+    assert sorted(os.listdir(tmp_path)) == ["game.sav"]
+
+
+def test_delete_removes_the_save_and_its_journal(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "game.sav")
+    engine = setup_game.new_game(seed=1)
+    engine.message_log.open_journal(savefile.get_journal_filename(filename))
+    savefile.save(engine, filename)
+    engine.message_log.journal.close()
+    assert len(os.listdir(tmp_path)) == 3
+
+    savefile.delete(filename)
+    savefile.delete(filename) #Already gone
+    assert os.listdir(tmp_path) == []
+
+
+def test_quitting_a_finished_game_removes_its_save_and_journal(tmp_path: str, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    engine = setup_game.new_game(seed=1)
+    engine.message_log.open_journal(savefile.get_journal_filename("savegame.sav"))
+    savefile.save(engine, "savegame.sav")
+
+    with pytest.raises(exceptions.QuitWithoutSaving):
+        input_handlers.GameOverEventHandler(engine).on_quit()
+    assert engine.message_log.journal.data_file.closed
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import csv
+import json
+import os
+
+from perf import Timings
+
+
+def play(timings: Timings, turns: int) -> None:
+    """Take `turns` turns and draw one frame, as a frame cap would."""
+    for _ in range(turns):
+        with timings.phase("action.perform"):
+            pass
+        with timings.phase("update_fov"):
+            pass
+        timings.end_turn()
+    with timings.phase("GameMap.render"):
+        pass
+    with timings.phase("context.present"):
+        pass
+    timings.end_frame()
+
+
+def test_trace_has_a_row_per_turn_and_per_frame(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "trace.csv")
+    timings = Timings()
+    timings.open_trace(filename)
+    play(timings, 3)
+    timings.close_trace()
+
+    with open(filename, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["row"], row["turn"], row["frame"]) for row in rows] == [
+        ("turn", "1", "0"), ("turn", "2", "0"), ("turn", "3", "0"), ("frame", "3", "1"),
+    ]
+    assert all(row["action.perform"] and not row["context.present"] for row in rows[:3])
+    assert rows[3]["context.present"] and not rows[3]["action.perform"]
+
+
+def test_jsonl_trace(tmp_path: str) -> None:
+    filename = os.path.join(tmp_path, "trace.jsonl")
+    timings = Timings()
+    timings.open_trace(filename)
+    play(timings, 2)
+    timings.close_trace()
+
+    with open(filename) as f:
+        rows = [json.loads(line) for line in f]
+    assert [row["row"] for row in rows] == ["turn", "turn", "frame"]
+    assert set(rows[2]) == {"row", "frame", "turn", "GameMap.render", "context.present"}
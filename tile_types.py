@@ -21,6 +21,9 @@ tile_dt = np.dtype(
     ]
 )
 
+#The same records seen as opaque bytes, numpy copies and fills these much faster.
+tile_raw_dt = np.dtype((np.void, tile_dt.itemsize))
+
 def new_tile(
     *, #Enforce keywords so parameter order doesn't matter.
     walkable: int,
@@ -31,9 +34,25 @@ def new_tile(
     """Helper function for defining individual tile types"""
     return np.array((walkable, transparent, dark, light), dtype=tile_dt)
 
+def new_tile_grid(width: int, height: int, fill_value: np.ndarray) -> np.ndarray:
+    """Return a (width, height) array of tiles in Fortran order, filled with one tile type."""
+    grid = np.full((width, height), fill_value=fill_value.view(tile_raw_dt), order="F")
+    return grid.view(tile_dt)
+
 #SHROUD is for unwalked, and unseen titles
 SHROUD = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
 
+#Layout of Console.rgb, which aligns every field to 4 bytes.
+console_graphic_dt = np.dtype(
+    {
+        "names": ["ch", "fg", "bg"],
+        "formats": [np.int32, "3B", "3B"],
+        "offsets": [0, 4, 8],
+        "itemsize": 12,
+    }
+)
+console_graphic_raw_dt = np.dtype((np.void, console_graphic_dt.itemsize))
+
 floor = new_tile(
     walkable=True, 
     transparent=True, 
@@ -54,3 +73,30 @@ down_stairs = new_tile(
     dark=(ord(">"), (0, 0, 100), (50, 50, 150)),
     light=(ord(">"), (255, 255, 255), (200, 180, 50)),
 )
+up_stairs = new_tile(
+    walkable=True,
+    transparent=True,
+    dark=(ord("<"), (0, 0, 100), (50, 50, 150)),
+    light=(ord("<"), (255, 255, 255), (200, 180, 50)),
+)
+
+#Every tile type, the ID of a tile is its index here. Only append, IDs are stored.
+tile_palette = (wall, floor, down_stairs, up_stairs)
+_raw_palette = np.array([tile.view(tile_raw_dt) for tile in tile_palette])
+
+def to_tile_ids(tiles: np.ndarray) -> np.ndarray:
+    """Return the ID of every tile, a much smaller array than the tiles themselves."""
+    raw_tiles = tiles.view(tile_raw_dt)
+    ids = np.zeros(tiles.shape, dtype=np.uint8, order="F")
+    known = np.zeros(tiles.shape, dtype=bool, order="F")
+    for tile_id, raw_tile in enumerate(_raw_palette):
+        matches = raw_tiles == raw_tile
+        ids[matches] = tile_id
+        known |= matches
+    if not known.all():
+        raise ValueError("Tiles not in the palette can't be turned into IDs")
+    return ids
+
+def from_tile_ids(ids: np.ndarray) -> np.ndarray:
+    """Return the tiles for an array of IDs from `to_tile_ids`."""
+    return np.asfortranarray(_raw_palette[ids]).view(tile_dt)